@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+
+import httpx
+
+from app.core.config import settings
+
+
+@dataclass
+class PoolStats:
+    requests: int = 0
+    connections_opened: int = 0
+
+    @property
+    def reused_requests(self) -> int:
+        return max(self.requests - self.connections_opened, 0)
+
+
+class SharedHTTPClients:
+    """
+    Process-wide httpx clients shared by every chat model, so connections stay
+    alive between chat turns instead of paying the TLS handshake on each request.
+
+    New TCP connections are counted through httpcore's trace extension, which
+    makes connection reuse observable next to the raw request count.
+    """
+
+    def __init__(self):
+        self.stats = PoolStats()
+        self._sync_client: httpx.Client | None = None
+        self._async_client: httpx.AsyncClient | None = None
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive_connections,
+            keepalive_expiry=settings.llm_keepalive_expiry,
+        )
+
+    def _sync_trace(self, event_name: str, _info: dict) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self.stats.connections_opened += 1
+
+    async def _async_trace(self, event_name: str, _info: dict) -> None:
+        self._sync_trace(event_name, _info)
+
+    def _on_sync_request(self, request: httpx.Request) -> None:
+        self.stats.requests += 1
+        request.extensions["trace"] = self._sync_trace
+
+    async def _on_async_request(self, request: httpx.Request) -> None:
+        self.stats.requests += 1
+        request.extensions["trace"] = self._async_trace
+
+    @property
+    def sync_client(self) -> httpx.Client:
+        if self._sync_client is None:
+            self._sync_client = httpx.Client(
+                limits=self._limits(),
+                http2=settings.llm_http2,
+                event_hooks={"request": [self._on_sync_request]},
+            )
+        return self._sync_client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                limits=self._limits(),
+                http2=settings.llm_http2,
+                event_hooks={"request": [self._on_async_request]},
+            )
+        return self._async_client
+
+    def pool_usage(self) -> dict[str, int]:
+        # httpx does not expose pool state publicly, read it from httpcore
+        usage = {}
+        for name, client in (
+            ("sync", self._sync_client),
+            ("async", self._async_client),
+        ):
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+            usage[f"{name}_connections"] = len(connections)
+            usage[f"{name}_idle_connections"] = sum(
+                1 for conn in connections if conn.is_idle()
+            )
+        return usage
+
+    def as_dict(self) -> dict[str, int | float]:
+        return {
+            "requests": self.stats.requests,
+            "connections_opened": self.stats.connections_opened,
+            "reused_requests": self.stats.reused_requests,
+            "reuse_ratio": self.stats.reused_requests / self.stats.requests
+            if self.stats.requests
+            else 0.0,
+            **self.pool_usage(),
+        }
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+
+shared_http_clients = SharedHTTPClients()
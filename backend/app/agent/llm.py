@@ -1,13 +1,22 @@
+import hashlib
+import json
+import threading
 from typing import Literal
 from langchain_core.messages import BaseMessage, AIMessage
 from langchain_nebius import ChatNebius
 from langchain_core.language_models import BaseChatModel
 from langchain_openai import ChatOpenAI
 
+from app.agent.http_pool import shared_http_clients
+
 _supported_model_providers = Literal["openai", "nebius"]
 
 
 class LLMFactory:
+    # process-wide chat models keyed by their resolved kwargs
+    _registry: dict[str, BaseChatModel] = {}
+    _registry_lock = threading.Lock()
+
     def __init__(
         self,
         model_name: str,
@@ -19,6 +28,7 @@ class LLMFactory:
         streaming: bool | None = None,
         reasoning_effort: str | None = None,
         base_url: str | None = None,
+        api_key: str | None = None,
     ):
         self.model_name = model_name
         self.model_provider = model_provider
@@ -29,6 +39,7 @@ class LLMFactory:
         self.max_retries = max_retries
         self.reasoning_effort = reasoning_effort
         self.streaming = streaming
+        self.api_key = api_key
 
     def prepare_base_kwargs(self) -> dict[str, any]:
         base_kwargs = {
@@ -46,12 +57,58 @@ class LLMFactory:
             base_kwargs["max_retries"] = self.max_retries
         if self.reasoning_effort:
             base_kwargs["reasoning_effort"] = self.reasoning_effort
+        if self.base_url:
+            base_kwargs["base_url"] = self.base_url
+        if self.api_key:
+            base_kwargs["api_key"] = self.api_key
         return base_kwargs
 
+    def registry_key(self, base_kwargs: dict[str, any]) -> str:
+        # hashed so that api keys never end up in logs or metrics labels
+        raw = json.dumps(
+            {"provider": self.model_provider, **base_kwargs},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(raw.encode()).hexdigest()
+
     def create_chat_model(self) -> BaseChatModel:
+        """
+        Return the chat model for these settings, reusing the instance created by
+        any previous factory with identical kwargs. Every model shares the same
+        pooled HTTP clients.
+        """
         base_kwargs = self.prepare_base_kwargs()
-        print("Base Kwargs: ", base_kwargs)
+        key = self.registry_key(base_kwargs)
+        with self._registry_lock:
+            llm = self._registry.get(key)
+            if llm is None:
+                llm = self._build(base_kwargs)
+                self._registry[key] = llm
+        return llm
+
+    def _build(self, base_kwargs: dict[str, any]) -> BaseChatModel:
+        base_kwargs = {
+            **base_kwargs,
+            "http_client": shared_http_clients.sync_client,
+            "http_async_client": shared_http_clients.async_client,
+        }
         if self.model_provider == "openai":
-            return ChatOpenAI(**base_kwargs)
+            # usage (including cached prompt tokens) is only sent on streams on request
+            return ChatOpenAI(stream_usage=True, **base_kwargs)
         elif self.model_provider == "nebius":
             return ChatNebius(**base_kwargs)
+        raise ValueError(f"Unsupported model provider: {self.model_provider}")
+
+    @classmethod
+    def stats(cls) -> dict[str, int | float]:
+        return {"models": len(cls._registry), **shared_http_clients.as_dict()}
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """
+        Drop every cached model and close the shared HTTP connection pools.
+        """
+        with cls._registry_lock:
+            cls._registry.clear()
+        await shared_http_clients.aclose()
@@ -0,0 +1,472 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, Sequence
+from urllib.parse import quote, urlparse
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.base.id import UUID
+from langgraph.checkpoint.memory import InMemorySaver
+
+from app.core.config import settings
+
+# uuid1/uuid6 timestamps count 100ns intervals since 1582-10-15
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+@dataclass
+class CheckpointerStats:
+    hot_hits: int = 0
+    hot_misses: int = 0
+    hot_evictions: int = 0
+    threads_expired: int = 0
+    checkpoints_compacted: int = 0
+    maintenance_runs: int = 0
+
+    def as_dict(self) -> dict[str, int | float]:
+        lookups = self.hot_hits + self.hot_misses
+        return {
+            "hot_hits": self.hot_hits,
+            "hot_misses": self.hot_misses,
+            "hot_evictions": self.hot_evictions,
+            "hot_hit_ratio": self.hot_hits / lookups if lookups else 0.0,
+            "threads_expired": self.threads_expired,
+            "checkpoints_compacted": self.checkpoints_compacted,
+            "maintenance_runs": self.maintenance_runs,
+        }
+
+
+@dataclass
+class _HotEntry:
+    value: CheckpointTuple
+    expires_at: float
+
+
+def checkpoint_age(checkpoint_id: str) -> float:
+    """
+    Seconds since the checkpoint was written, decoded from its uuid6 id.
+    """
+    created = (UUID(checkpoint_id).time - _UUID_EPOCH_OFFSET) / 1e7
+    return max(time.time() - created, 0.0)
+
+
+class ManagedCheckpointer(BaseCheckpointSaver):
+    """
+    Checkpoint saver in front of a durable backend (SQLite or Postgres).
+
+    The graph is compiled against this proxy at import time, the backend is
+    attached in the app lifespan. Until then an InMemorySaver is used.
+
+    - hot tier: the latest checkpoint of recently read threads is kept in an LRU
+      bounded by `hot_max_threads` and dropped on every local write. Entries
+      expire after `hot_ttl_seconds`, which bounds staleness when several
+      workers share the same database.
+    - maintenance: threads idle longer than `thread_ttl_seconds` are deleted,
+      and every remaining thread is compacted to its last `keep_last`
+      checkpoints so the history stops growing with the conversation.
+    """
+
+    def __init__(
+        self,
+        backend: BaseCheckpointSaver | None = None,
+        hot_max_threads: int = 256,
+        hot_ttl_seconds: float = 5,
+        thread_ttl_seconds: float | None = None,
+        keep_last: int | None = None,
+    ):
+        self.backend = backend or InMemorySaver()
+        super().__init__(serde=self.backend.serde)
+        self.hot_max_threads = hot_max_threads
+        self.hot_ttl_seconds = hot_ttl_seconds
+        self.thread_ttl_seconds = thread_ttl_seconds
+        self.keep_last = keep_last
+        self.stats = CheckpointerStats()
+        self._hot: OrderedDict[tuple[str, str], _HotEntry] = OrderedDict()
+        self._maintenance_task: asyncio.Task | None = None
+
+    @property
+    def backend_name(self) -> str:
+        return type(self.backend).__name__
+
+    def attach(self, backend: BaseCheckpointSaver) -> None:
+        self.backend = backend
+        self.serde = backend.serde
+        self._hot.clear()
+
+    def detach(self) -> None:
+        self.attach(InMemorySaver())
+
+    # hot tier
+
+    @staticmethod
+    def _thread_key(config: RunnableConfig) -> tuple[str, str]:
+        configurable = config["configurable"]
+        return str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+
+    def _hot_get(self, config: RunnableConfig) -> CheckpointTuple | None:
+        key = self._thread_key(config)
+        entry = self._hot.get(key)
+        if entry is None or entry.expires_at < time.monotonic():
+            return None
+        checkpoint_id = get_checkpoint_id(config)
+        # the cached tuple is the latest one, which also answers lookups by its id
+        if checkpoint_id and checkpoint_id != entry.value.checkpoint["id"]:
+            return None
+        self._hot.move_to_end(key)
+        return entry.value
+
+    def _hot_put(self, config: RunnableConfig, value: CheckpointTuple) -> None:
+        key = self._thread_key(config)
+        self._hot[key] = _HotEntry(
+            value=value, expires_at=time.monotonic() + self.hot_ttl_seconds
+        )
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_max_threads:
+            self._hot.popitem(last=False)
+            self.stats.hot_evictions += 1
+
+    def _hot_drop(self, config: RunnableConfig) -> None:
+        self._hot.pop(self._thread_key(config), None)
+
+    def _hot_drop_thread(self, thread_id: str) -> None:
+        for key in [key for key in self._hot if key[0] == str(thread_id)]:
+            del self._hot[key]
+
+    # BaseCheckpointSaver, delegated to the backend
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return self.backend.get_tuple(config)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        return self.backend.list(config, filter=filter, before=before, limit=limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        self._hot_drop(config)
+        return self.backend.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self._hot_drop(config)
+        self.backend.put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._hot_drop_thread(thread_id)
+        self.backend.delete_thread(thread_id)
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        value = self._hot_get(config)
+        if value is not None:
+            self.stats.hot_hits += 1
+            return value
+        self.stats.hot_misses += 1
+        value = await self.backend.aget_tuple(config)
+        if value is not None and not get_checkpoint_id(config):
+            self._hot_put(config, value)
+        return value
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        async for value in self.backend.alist(
+            config, filter=filter, before=before, limit=limit
+        ):
+            yield value
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        self._hot_drop(config)
+        return await self.backend.aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self._hot_drop(config)
+        await self.backend.aput_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self._hot_drop_thread(thread_id)
+        await self.backend.adelete_thread(thread_id)
+
+    def get_next_version(self, current: Any, channel: None) -> Any:
+        return self.backend.get_next_version(current, channel)
+
+    # maintenance
+
+    async def _latest_checkpoints(self) -> dict[str, str]:
+        """
+        Latest checkpoint id of every stored thread.
+        """
+        backend = self.backend
+        if isinstance(backend, InMemorySaver):
+            return {
+                thread_id: max(cid for ns in namespaces.values() for cid in ns)
+                for thread_id, namespaces in backend.storage.items()
+                if any(namespaces.values())
+            }
+        rows = await self._execute(
+            "SELECT thread_id, MAX(checkpoint_id) FROM checkpoints GROUP BY thread_id",
+            fetch=True,
+        )
+        return {str(thread_id): checkpoint_id for thread_id, checkpoint_id in rows}
+
+    async def _compact(self, thread_id: str) -> int:
+        """
+        Delete every checkpoint of the thread except the last `keep_last` ones,
+        together with their pending writes. Returns the number of checkpoints deleted.
+        """
+        backend = self.backend
+        if isinstance(backend, InMemorySaver):
+            # channel blobs are only released once the whole thread expires
+            deleted = 0
+            for checkpoint_ns, checkpoints in backend.storage[thread_id].items():
+                for checkpoint_id in sorted(checkpoints, reverse=True)[
+                    self.keep_last :
+                ]:
+                    del checkpoints[checkpoint_id]
+                    backend.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                    deleted += 1
+            return deleted
+
+        # checkpoint ids are uuid6, so they sort by creation time
+        stale = """
+            SELECT checkpoint_ns, checkpoint_id FROM (
+                SELECT checkpoint_ns, checkpoint_id, ROW_NUMBER() OVER (
+                    PARTITION BY checkpoint_ns ORDER BY checkpoint_id DESC
+                ) AS rank
+                FROM checkpoints WHERE thread_id = {p}
+            ) ranked WHERE rank > {p}
+        """
+        postgres = self._is_postgres()
+        p = "%s" if postgres else "?"
+        writes_table = "checkpoint_writes" if postgres else "writes"
+        params = (thread_id, self.keep_last)
+        rows = await self._execute(stale.format(p=p), params, fetch=True)
+        if not rows:
+            return 0
+        await self._execute(
+            f"DELETE FROM {writes_table} WHERE thread_id = {p} AND "
+            f"(checkpoint_ns, checkpoint_id) IN ({stale.format(p=p)})",
+            (thread_id, *params),
+        )
+        await self._execute(
+            f"DELETE FROM checkpoints WHERE thread_id = {p} AND "
+            f"(checkpoint_ns, checkpoint_id) IN ({stale.format(p=p)})",
+            (thread_id, *params),
+        )
+        if postgres:
+            # channel values live in a separate table, keyed by channel version
+            await self._execute(
+                """
+                DELETE FROM checkpoint_blobs b
+                WHERE b.thread_id = %s AND NOT EXISTS (
+                    SELECT 1 FROM checkpoints c
+                    WHERE c.thread_id = b.thread_id
+                    AND c.checkpoint_ns = b.checkpoint_ns
+                    AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+                )
+                """,
+                (thread_id,),
+            )
+        return len(rows)
+
+    def _is_postgres(self) -> bool:
+        return _is_postgres(self.backend)
+
+    async def _execute(
+        self, query: str, params: tuple = (), fetch: bool = False
+    ) -> Sequence[tuple]:
+        return await _execute(self.backend, query, params, fetch)
+
+    async def run_maintenance(self) -> None:
+        for thread_id, checkpoint_id in (await self._latest_checkpoints()).items():
+            if (
+                self.thread_ttl_seconds is not None
+                and checkpoint_age(checkpoint_id) > self.thread_ttl_seconds
+            ):
+                await self.adelete_thread(thread_id)
+                self.stats.threads_expired += 1
+            elif self.keep_last is not None:
+                self.stats.checkpoints_compacted += await self._compact(thread_id)
+        self.stats.maintenance_runs += 1
+
+    async def _maintenance_loop(self, interval: float) -> None:
+        while True:
+            try:
+                await self.run_maintenance()
+            except Exception as e:
+                print(f"[ERROR] Checkpoint maintenance failed: {e}")
+            await asyncio.sleep(interval)
+
+    def start_maintenance(self, interval: float) -> None:
+        self._maintenance_task = asyncio.create_task(
+            self._maintenance_loop(interval), name="checkpoint-maintenance"
+        )
+
+    async def stop_maintenance(self) -> None:
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            await asyncio.gather(self._maintenance_task, return_exceptions=True)
+            self._maintenance_task = None
+
+    def as_dict(self) -> dict[str, int | float | str]:
+        return {
+            "backend": self.backend_name,
+            "hot_entries": len(self._hot),
+            **self.stats.as_dict(),
+        }
+
+
+def _is_postgres(backend: BaseCheckpointSaver) -> bool:
+    return type(backend).__module__.startswith("langgraph.checkpoint.postgres")
+
+
+async def _execute(
+    backend: BaseCheckpointSaver, query: str, params: tuple, fetch: bool
+) -> list[tuple]:
+    # maintenance queries go through the saver's own connection and lock
+    if _is_postgres(backend):
+        from psycopg_pool import AsyncConnectionPool
+
+        async with backend.lock:
+            if isinstance(backend.conn, AsyncConnectionPool):
+                async with backend.conn.connection() as conn:
+                    return await _pg_execute(conn, query, params, fetch)
+            return await _pg_execute(backend.conn, query, params, fetch)
+
+    async with backend.lock, backend.conn.execute(query, params) as cursor:
+        rows = await cursor.fetchall() if fetch else []
+    await backend.conn.commit()
+    return [tuple(row) for row in rows]
+
+
+async def _pg_execute(conn, query: str, params: tuple, fetch: bool) -> list[tuple]:
+    from psycopg.rows import tuple_row
+
+    async with conn.cursor(row_factory=tuple_row) as cursor:
+        await cursor.execute(query, params)
+        return await cursor.fetchall() if fetch else []
+
+
+def postgres_conninfo() -> str:
+    # postgres_host may be given as a URL (http://host:port) or a bare host
+    host = settings.postgres_host
+    parsed = urlparse(host if "://" in host else f"//{host}")
+    return (
+        f"postgresql://{quote(settings.postgres_user)}:"
+        f"{quote(settings.postgres_password)}@{parsed.hostname}:{parsed.port or 5432}/"
+        f"{settings.postgres_db_name}"
+    )
+
+
+checkpointer = ManagedCheckpointer(
+    hot_max_threads=settings.checkpointer_hot_max_threads,
+    hot_ttl_seconds=settings.checkpointer_hot_ttl_seconds,
+    thread_ttl_seconds=settings.checkpointer_thread_ttl_seconds,
+    keep_last=settings.checkpointer_keep_last,
+)
+
+
+@asynccontextmanager
+async def open_checkpointer() -> AsyncIterator[ManagedCheckpointer]:
+    """
+    Attach the backend selected by `settings.checkpointer_backend` to the
+    shared checkpointer and run its maintenance task for the duration.
+    """
+    async with _open_backend(settings.checkpointer_backend) as backend:
+        if backend is not None:
+            checkpointer.attach(backend)
+        print(f"[INFO] Using {checkpointer.backend_name} for agent checkpoints")
+        checkpointer.start_maintenance(settings.checkpointer_maintenance_interval)
+        try:
+            yield checkpointer
+        finally:
+            await checkpointer.stop_maintenance()
+            if backend is not None:
+                checkpointer.detach()
+
+
+@asynccontextmanager
+async def _open_backend(name: str) -> AsyncIterator[BaseCheckpointSaver | None]:
+    if name == "sqlite":
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        Path(settings.checkpointer_sqlite_path).parent.mkdir(
+            parents=True, exist_ok=True
+        )
+        async with AsyncSqliteSaver.from_conn_string(
+            settings.checkpointer_sqlite_path
+        ) as backend:
+            # WAL lets several workers read while one of them writes
+            await backend.conn.execute("PRAGMA journal_mode=WAL")
+            await backend.setup()
+            yield backend
+    elif name == "postgres":
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        from psycopg.rows import dict_row
+        from psycopg_pool import AsyncConnectionPool
+
+        async with AsyncConnectionPool(
+            conninfo=postgres_conninfo(),
+            max_size=settings.checkpointer_postgres_pool_size,
+            kwargs={
+                "autocommit": True,
+                "prepare_threshold": 0,
+                "row_factory": dict_row,
+            },
+        ) as pool:
+            backend = AsyncPostgresSaver(pool)
+            await backend.setup()
+            yield backend
+    else:
+        # keep the in-memory saver, bounded by the same maintenance
+        yield None
+
+
+def get_checkpointer() -> ManagedCheckpointer:
+    """
+    Get the checkpointer instance for dependency injection.
+    """
+    return checkpointer
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, Field
 from langchain_core.language_models.chat_models import BaseChatModel
 
@@ -13,3 +15,10 @@ class AppContext(BaseModel):
         default=None,
         description="LLM Chat Model class to call the LLM",
     )
+    # per-request values, placed after the cacheable part of the prompt
+    current_time: Optional[str] = Field(
+        default=None, description="Time of the request, shown to the model"
+    )
+    user_location: Optional[str] = Field(
+        default=None, description="Location of the user, shown to the model"
+    )
@@ -0,0 +1,135 @@
+import json
+from functools import lru_cache
+from typing import Sequence
+
+import tiktoken
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+)
+
+from app.core.config import settings
+
+# tokens added by the chat format around every message
+_MESSAGE_OVERHEAD = 4
+
+
+@lru_cache(maxsize=32)
+def _get_encoding(model_name: str | None) -> tiktoken.Encoding | None:
+    try:
+        return tiktoken.encoding_for_model(model_name or "")
+    except KeyError:
+        pass
+    except Exception:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # the encoding file is downloaded on first use, which fails offline
+        print(f"[WARN] tiktoken encoding unavailable, estimating tokens: {e}")
+        return None
+
+
+def model_name_of(llm: BaseChatModel) -> str | None:
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None)
+
+
+def count_text_tokens(text: str, model_name: str | None = None) -> int:
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model_name: str | None = None) -> str:
+    """
+    Cut the text down to `max_tokens`, noting how much was left out.
+    """
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        tokens = len(text) // 4 + 1
+        head = text[: max_tokens * 4]
+    else:
+        encoded = encoding.encode(text, disallowed_special=())
+        tokens = len(encoded)
+        head = encoding.decode(encoded[:max_tokens])
+    if tokens <= max_tokens:
+        return text
+    return f"{head} ... [truncated {tokens - max_tokens} tokens]"
+
+
+def count_message_tokens(
+    messages: Sequence[BaseMessage], model_name: str | None = None
+) -> int:
+    total = 0
+    for message in messages:
+        total += _MESSAGE_OVERHEAD + count_text_tokens(message.text, model_name)
+        if isinstance(message, AIMessage) and message.tool_calls:
+            total += count_text_tokens(
+                json.dumps([(c["name"], c["args"]) for c in message.tool_calls]),
+                model_name,
+            )
+    return total
+
+
+def context_budget(model_name: str | None) -> int:
+    """
+    Prompt token budget of the model, `context_model_max_tokens` overrides the default.
+    """
+    return settings.context_model_max_tokens.get(
+        model_name or "", settings.context_max_tokens
+    )
+
+
+def split_system(
+    messages: Sequence[BaseMessage],
+) -> tuple[list[BaseMessage], list[BaseMessage]]:
+    """
+    Split off the leading system messages, which are always sent verbatim.
+    """
+    start = 0
+    while start < len(messages) and isinstance(messages[start], SystemMessage):
+        start += 1
+    return list(messages[:start]), list(messages[start:])
+
+
+def select_overflow(
+    messages: Sequence[BaseMessage],
+    summary: str | None,
+    model_name: str | None = None,
+) -> list[BaseMessage]:
+    """
+    Older messages to fold into the running summary, empty while the
+    conversation fits the budget.
+
+    Once the budget is exceeded, the most recent turns filling up
+    `context_keep_ratio` of it are kept. The cut is always made on a human
+    message, so tool calls stay next to their tool results and the current
+    turn is never folded.
+    """
+    budget = context_budget(model_name)
+    system, history = split_system(messages)
+    fixed = count_message_tokens(system, model_name)
+    if summary:
+        fixed += count_text_tokens(summary, model_name) + _MESSAGE_OVERHEAD
+    if fixed + count_message_tokens(history, model_name) <= budget:
+        return []
+
+    turn_starts = [
+        i for i, message in enumerate(history) if isinstance(message, HumanMessage)
+    ]
+    if len(turn_starts) < 2:
+        return []
+    keep_budget = budget * settings.context_keep_ratio - fixed
+    # the last turn is kept whatever its size
+    cut = turn_starts[-1]
+    kept = count_message_tokens(history[cut:], model_name)
+    for start in reversed(turn_starts[:-1]):
+        kept += count_message_tokens(history[start:cut], model_name)
+        if kept > keep_budget:
+            break
+        cut = start
+    return history[:cut]
@@ -0,0 +1,320 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator
+
+from ag_ui.core import (
+    BaseEvent,
+    EventType,
+    TextMessageContentEvent,
+    TextMessageEndEvent,
+    TextMessageStartEvent,
+    ToolCallArgsEvent,
+    ToolCallEndEvent,
+    ToolCallStartEvent,
+)
+from ag_ui.encoder import EventEncoder
+from langchain_core.messages import ToolCallChunk
+from langchain_core.messages.ai import UsageMetadata
+
+from app.core.config import settings
+from app.core.telemetry import (
+    LLM_TOKENS,
+    STREAM_BYTES,
+    STREAM_EVENTS,
+    TIME_TO_FIRST_EVENT,
+    TIME_TO_FIRST_TOKEN,
+)
+
+
+@dataclass
+class StreamStats:
+    run_id: str
+    thread_id: str
+    events: int = 0
+    bytes: int = 0
+    text_chunks: int = 0
+    text_frames: int = 0
+    tool_arg_frames: int = 0
+    # token usage of the agent's model calls, as reported by the provider
+    llm_calls: int = 0
+    input_tokens: int = 0
+    cached_input_tokens: int = 0
+    output_tokens: int = 0
+    started_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+
+    def record_usage(self, usage: UsageMetadata | None) -> None:
+        if not usage:
+            return
+        self.llm_calls += 1
+        self.input_tokens += usage.get("input_tokens", 0)
+        self.output_tokens += usage.get("output_tokens", 0)
+        details = usage.get("input_token_details") or {}
+        self.cached_input_tokens += details.get("cache_read", 0)
+        LLM_TOKENS.labels(kind="input").inc(usage.get("input_tokens", 0))
+        LLM_TOKENS.labels(kind="cached_input").inc(details.get("cache_read", 0))
+        LLM_TOKENS.labels(kind="output").inc(usage.get("output_tokens", 0))
+
+    def as_dict(self) -> dict[str, int | float | str | None]:
+        return {
+            "run_id": self.run_id,
+            "thread_id": self.thread_id,
+            "events": self.events,
+            "bytes": self.bytes,
+            "text_chunks": self.text_chunks,
+            "text_frames": self.text_frames,
+            "tool_arg_frames": self.tool_arg_frames,
+            "llm_calls": self.llm_calls,
+            "input_tokens": self.input_tokens,
+            "cached_input_tokens": self.cached_input_tokens,
+            "cached_input_ratio": self.cached_input_tokens / self.input_tokens
+            if self.input_tokens
+            else 0.0,
+            "output_tokens": self.output_tokens,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+# stats of the most recent streams, newest last
+recent_streams: OrderedDict[str, StreamStats] = OrderedDict()
+_RECENT_STREAMS_MAX_SIZE = 100
+
+
+class EventShaper:
+    """
+    Turns the model's token chunks into AG-UI SSE frames.
+
+    Text deltas are merged into one TEXT_MESSAGE_CONTENT frame until
+    `flush_ms` has passed since the last frame or `flush_bytes` are buffered.
+    The first delta goes out immediately so the time to first token is not
+    delayed, and the buffer is flushed before every tool or end event. The
+    window is checked when the next chunk arrives, `flush_on_idle` flushes
+    what is left when the model stalls.
+
+    Tool calls get their START once, when the chunk carrying the id and name
+    arrives, then every argument fragment as its own ARGS delta. They are
+    closed with END once the model message is complete.
+    """
+
+    def __init__(
+        self,
+        encoder: EventEncoder,
+        message_id: str,
+        stats: StreamStats,
+        flush_ms: float = 50,
+        flush_bytes: int = 512,
+    ):
+        self.encoder = encoder
+        self.message_id = message_id
+        self.stats = stats
+        self.flush_seconds = flush_ms / 1000
+        self.flush_bytes = flush_bytes
+        self.message_started = False
+        self._text: list[str] = []
+        self._text_bytes = 0
+        self._last_flush = 0.0
+        self._started = time.perf_counter()
+        self._first_event_seen = False
+        self._first_token_seen = False
+        # tool call chunks of the current model message, by chunk index
+        self._tool_calls: dict[int, str] = {}
+
+    def encode(self, event: BaseEvent) -> str:
+        frame = self.encoder.encode(event)
+        size = len(frame.encode())
+        self.stats.events += 1
+        self.stats.bytes += size
+        STREAM_EVENTS.inc()
+        STREAM_BYTES.inc(size)
+        # RUN_STARTED goes out before any work, the first event after it is
+        # the first sign of progress the client sees
+        if not self._first_event_seen and event.type != EventType.RUN_STARTED:
+            self._first_event_seen = True
+            TIME_TO_FIRST_EVENT.observe(time.perf_counter() - self._started)
+        return frame
+
+    def text(self, delta: str) -> list[str]:
+        frames = []
+        if not self.message_started:
+            frames.append(
+                self.encode(
+                    TextMessageStartEvent(
+                        type=EventType.TEXT_MESSAGE_START,
+                        message_id=self.message_id,
+                        role="assistant",
+                    )
+                )
+            )
+            self.message_started = True
+        self.stats.text_chunks += 1
+        self._text.append(delta)
+        self._text_bytes += len(delta.encode())
+        if (
+            self._text_bytes >= self.flush_bytes
+            or time.monotonic() - self._last_flush >= self.flush_seconds
+        ):
+            frames.extend(self.flush())
+        return frames
+
+    def flush_due_in(self) -> float | None:
+        """
+        Seconds until the buffered text is due, None when nothing is buffered.
+        """
+        if not self._text:
+            return None
+        return max(0.0, self._last_flush + self.flush_seconds - time.monotonic())
+
+    def flush(self) -> list[str]:
+        if not self._text:
+            return []
+        delta = "".join(self._text)
+        self._text.clear()
+        self._text_bytes = 0
+        self._last_flush = time.monotonic()
+        self.stats.text_frames += 1
+        if not self._first_token_seen:
+            self._first_token_seen = True
+            TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - self._started)
+        return [
+            self.encode(
+                TextMessageContentEvent(
+                    type=EventType.TEXT_MESSAGE_CONTENT,
+                    message_id=self.message_id,
+                    delta=delta,
+                )
+            )
+        ]
+
+    def tool_call_chunk(self, chunk: ToolCallChunk) -> list[str]:
+        frames = self.flush()
+        index = chunk.get("index") or 0
+        tool_call_id = self._tool_calls.get(index)
+        if tool_call_id is None:
+            # the first chunk of a call carries its id and name
+            if not chunk.get("id") or not chunk.get("name"):
+                return frames
+            tool_call_id = chunk["id"]
+            self._tool_calls[index] = tool_call_id
+            frames.append(
+                self.encode(
+                    ToolCallStartEvent(
+                        type=EventType.TOOL_CALL_START,
+                        tool_call_name=chunk["name"],
+                        tool_call_id=tool_call_id,
+                    )
+                )
+            )
+        if chunk.get("args"):
+            self.stats.tool_arg_frames += 1
+            frames.append(
+                self.encode(
+                    ToolCallArgsEvent(
+                        type=EventType.TOOL_CALL_ARGS,
+                        tool_call_id=tool_call_id,
+                        delta=chunk["args"],
+                    )
+                )
+            )
+        return frames
+
+    def end_model_message(self) -> list[str]:
+        """
+        Close the tool calls of the model message that just completed.
+        """
+        frames = self.flush()
+        for tool_call_id in self._tool_calls.values():
+            frames.append(
+                self.encode(
+                    ToolCallEndEvent(
+                        type=EventType.TOOL_CALL_END, tool_call_id=tool_call_id
+                    )
+                )
+            )
+        self._tool_calls.clear()
+        return frames
+
+    def end(self) -> list[str]:
+        frames = self.end_model_message()
+        if self.message_started:
+            frames.append(
+                self.encode(
+                    TextMessageEndEvent(
+                        type=EventType.TEXT_MESSAGE_END,
+                        message_id=self.message_id,
+                    )
+                )
+            )
+        return frames
+
+
+@dataclass
+class _StreamFailed:
+    error: Exception
+
+
+_STREAM_END = object()
+
+
+async def flush_on_idle(
+    shaper: EventShaper, stream: AsyncIterator[Any]
+) -> AsyncIterator[Any]:
+    """
+    Pass the agent stream through, yielding ("frames", [...]) with the buffered
+    text once its flush window has passed even if no new chunk arrived.
+    """
+    # one pump task reads the stream for its whole life, so waiting with a
+    # timeout never interrupts the stream itself
+    queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    async def pump() -> None:
+        try:
+            async for item in stream:
+                await queue.put(item)
+        except Exception as e:
+            await queue.put(_StreamFailed(e))
+        else:
+            await queue.put(_STREAM_END)
+
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), shaper.flush_due_in())
+            except TimeoutError:
+                yield "frames", shaper.flush()
+                continue
+            if item is _STREAM_END:
+                return
+            if isinstance(item, _StreamFailed):
+                raise item.error
+            yield item
+    finally:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+def start_stream_stats(run_id: str, thread_id: str) -> StreamStats:
+    stats = StreamStats(run_id=run_id, thread_id=thread_id)
+    recent_streams[run_id] = stats
+    recent_streams.move_to_end(run_id)
+    while len(recent_streams) > _RECENT_STREAMS_MAX_SIZE:
+        recent_streams.popitem(last=False)
+    return stats
+
+
+def create_event_shaper(
+    encoder: EventEncoder, message_id: str, run_id: str, thread_id: str
+) -> EventShaper:
+    return EventShaper(
+        encoder=encoder,
+        message_id=message_id,
+        stats=start_stream_stats(run_id, thread_id),
+        flush_ms=settings.stream_text_flush_ms,
+        flush_bytes=settings.stream_text_flush_bytes,
+    )
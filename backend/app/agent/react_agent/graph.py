@@ -1,4 +1,6 @@
 from typing import AsyncGenerator, cast
+import asyncio
+import time
 import uuid
 from datetime import datetime
 from langchain_core.messages import (
@@ -8,45 +10,63 @@ from langchain_core.messages import (
     AIMessageChunk,
 )
 from langchain_core.runnables import RunnableConfig
-from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.graph import StateGraph, START
 from langgraph.prebuilt import ToolNode
 from langchain_core.language_models import BaseChatModel
 
+from app.agent.react_agent.checkpointer import checkpointer
+from app.agent.react_agent.event_stream import (
+    EventShaper,
+    create_event_shaper,
+    flush_on_idle,
+)
+from app.agent.react_agent.tool_execution import tool_executor
 from app.agent.react_agent.tools import TOOLS
 from app.agent.react_agent.states import AgentState
-from app.agent.react_agent.nodes import agent_node, router_function
+from app.agent.react_agent.nodes import agent_node, context_node, router_function
 from app.agent.react_agent.prompts import REACT_AGENT_SYSTEM_PROMPT
 from app.agent.react_agent.context import AppContext
+from app.core.telemetry import RUNS, bind_run, span
 from ag_ui.encoder import EventEncoder
 from ag_ui.core import (
     EventType,
     RunStartedEvent,
     RunFinishedEvent,
-    TextMessageStartEvent,
-    TextMessageContentEvent,
-    TextMessageEndEvent,
     BaseEvent,
-    ToolCallStartEvent,
-    ToolCallArgsEvent,
-    ToolCallEndEvent,
     ToolCallResultEvent,
+    ThinkingStartEvent,
+    ThinkingEndEvent,
+    ThinkingTextMessageStartEvent,
+    ThinkingTextMessageContentEvent,
+    ThinkingTextMessageEndEvent,
 )
 
 graph = StateGraph(state_schema=AgentState)
 
+graph.add_node("context_node", context_node)
 graph.add_node("agent_node", agent_node)
-tool_node = ToolNode(tools=TOOLS)
+tool_node = ToolNode(tools=TOOLS, awrap_tool_call=tool_executor)
 graph.add_node("tool_node", tool_node)
-graph.add_edge(START, "agent_node")
+graph.add_edge(START, "context_node")
+graph.add_edge("context_node", "agent_node")
 graph.add_conditional_edges("agent_node", router_function)
 graph.add_edge("tool_node", "agent_node")
 
-checkpointer = InMemorySaver()
-
 agent = graph.compile(checkpointer=checkpointer)
 
 
+def end_thinking(shaper: EventShaper) -> list[str]:
+    """
+    Frames that close an open thinking block.
+    """
+    return [
+        shaper.encode(
+            ThinkingTextMessageEndEvent(type=EventType.THINKING_TEXT_MESSAGE_END)
+        ),
+        shaper.encode(ThinkingEndEvent(type=EventType.THINKING_END)),
+    ]
+
+
 async def call_agent(
     human_message: str,
     llm: BaseChatModel,
@@ -61,10 +81,16 @@ async def call_agent(
     if run_id is None:
         run_id = str(uuid.uuid4())
 
+    bind_run(thread_id, run_id)
+
     # for checkpoint
     config: RunnableConfig = RunnableConfig(configurable={"thread_id": thread_id})
 
-    yield encoder.encode(
+    # Generate a message ID for the assistant's response
+    message_id = str(uuid.uuid4())
+    shaper = create_event_shaper(encoder, message_id, run_id, thread_id)
+
+    yield shaper.encode(
         RunStartedEvent(
             type=EventType.RUN_STARTED,
             run_id=run_id,
@@ -76,116 +102,125 @@ async def call_agent(
     # Check if there is an existing agent state
     # If not, add the system prompt
     existing_agent_state = await agent.aget_state(config=config)
-    print("Current Time: ", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    print("User Location: ", metadata.get("user_location", "Unknown"))
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    user_location = metadata.get("user_location", "Unknown")
     if not existing_agent_state.values:
-        messages.append(
-            SystemMessage(
-                content=REACT_AGENT_SYSTEM_PROMPT.format(
-                    current_time=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                )
-            )
-        )
+        messages.append(SystemMessage(content=REACT_AGENT_SYSTEM_PROMPT))
     messages.append(HumanMessage(content=human_message))
 
     init_state = AgentState(messages=messages)
+    # time and location are passed per request instead of being baked into
+    # the system prompt, see prompt_assembly
     runtime_context_config = AppContext(
-        llm=llm, system_prompt=REACT_AGENT_SYSTEM_PROMPT
+        llm=llm,
+        system_prompt=REACT_AGENT_SYSTEM_PROMPT,
+        current_time=current_time,
+        user_location=user_location,
     )
 
-    # Generate a message ID for the assistant's response
-    message_id = str(uuid.uuid4())
-    message_started = False
-
-    async for stream_mode, content in agent.astream(
-        init_state,
-        config=config,
-        context=runtime_context_config,
-        stream_mode=["updates", "messages"],
-    ):
-        if stream_mode == "updates":
-            for node_name, state in content.items():
-                if node_name == "tool_node":
-                    # Get the last message from the state which should be the tool result
-                    if state.get("messages"):
-                        last_message = state["messages"][-1]
-                        print("Tool call results: ", last_message)
-                        yield encoder.encode(
-                            ToolCallResultEvent(
-                                type=EventType.TOOL_CALL_RESULT,
-                                content=last_message.content,
-                                tool_call_id=last_message.tool_call_id,
-                                message_id=message_id,
-                            )
-                        )
-        elif stream_mode == "messages":
-            msg_chunk, metadata = content
-            node_name = metadata["langgraph_node"]
-            msg_chunk = cast(BaseMessageChunk, msg_chunk)
-            if node_name == "agent_node":
-                msg_chunk = cast(AIMessageChunk, msg_chunk)
-                if msg_chunk.tool_call_chunks:
-                    for tool_call in msg_chunk.tool_calls:
-                        tool_name = tool_call.get("name")
-                        tool_args = tool_call.get("args", {})
-                        tool_id = tool_call.get("id", "")
-                        if not tool_name or not tool_id:
-                            continue
-                        print("Tool name: ", tool_name)
-                        print("Tool args: ", tool_args)
-                        print("Tool id: ", tool_id)
-                        yield encoder.encode(
-                            ToolCallStartEvent(
-                                type=EventType.TOOL_CALL_START,
-                                tool_call_name=tool_name,
-                                tool_call_id=tool_id,
+    thinking_started = False
+
+    try:
+        with span("chat_run"):
+            stream = agent.astream(
+                init_state,
+                config=config,
+                context=runtime_context_config,
+                stream_mode=["updates", "messages", "custom"],
+            )
+            async for stream_mode, content in flush_on_idle(shaper, stream):
+                if stream_mode == "frames":
+                    # buffered text whose flush window passed while idle
+                    for frame in content:
+                        yield frame
+                elif stream_mode == "updates":
+                    for node_name, state in content.items():
+                        if node_name == "agent_node":
+                            for message in (state or {}).get("messages", []):
+                                shaper.stats.record_usage(message.usage_metadata)
+                            # the model message is complete, close its tool calls
+                            for frame in shaper.end_model_message():
+                                yield frame
+                        elif node_name == "tool_node":
+                            # a failed or timed out do_reasoning never sends
+                            # reasoning_done, close its block with the result
+                            if thinking_started:
+                                for frame in end_thinking(shaper):
+                                    yield frame
+                                thinking_started = False
+                            for frame in shaper.flush():
+                                yield frame
+                            # one result per tool call, several when they ran in parallel
+                            for tool_message in (state or {}).get("messages", []):
+                                yield shaper.encode(
+                                    ToolCallResultEvent(
+                                        type=EventType.TOOL_CALL_RESULT,
+                                        content=tool_message.content,
+                                        tool_call_id=tool_message.tool_call_id,
+                                        message_id=message_id,
+                                    )
+                                )
+                elif stream_mode == "custom":
+                    # reasoning streamed by the do_reasoning tool
+                    if "reasoning_delta" in content:
+                        if not thinking_started:
+                            yield shaper.encode(
+                                ThinkingStartEvent(
+                                    type=EventType.THINKING_START, title="Reasoning"
+                                )
                             )
-                        )
-                        yield encoder.encode(
-                            ToolCallArgsEvent(
-                                type=EventType.TOOL_CALL_ARGS,
-                                tool_call_id=tool_id,
-                                delta=str(tool_args),
+                            yield shaper.encode(
+                                ThinkingTextMessageStartEvent(
+                                    type=EventType.THINKING_TEXT_MESSAGE_START
+                                )
                             )
-                        )
-                        yield encoder.encode(
-                            ToolCallEndEvent(
-                                type=EventType.TOOL_CALL_END, tool_call_id=tool_id
+                            thinking_started = True
+                        yield shaper.encode(
+                            ThinkingTextMessageContentEvent(
+                                type=EventType.THINKING_TEXT_MESSAGE_CONTENT,
+                                delta=content["reasoning_delta"],
                             )
                         )
-                if msg_chunk.content:
-                    # Send TEXT_MESSAGE_START event on first chunk
-                    if not message_started:
-                        yield encoder.encode(
-                            TextMessageStartEvent(
-                                type=EventType.TEXT_MESSAGE_START,
-                                message_id=message_id,
-                                role="assistant",
-                            )
-                        )
-                        message_started = True
-                    # Send TEXT_MESSAGE_CONTENT event for each chunk
-                    yield encoder.encode(
-                        TextMessageContentEvent(
-                            type=EventType.TEXT_MESSAGE_CONTENT,
-                            message_id=message_id,
-                            delta=str(msg_chunk.content),
-                        )
-                    )
+                    elif content.get("reasoning_done") and thinking_started:
+                        for frame in end_thinking(shaper):
+                            yield frame
+                        thinking_started = False
+                elif stream_mode == "messages":
+                    msg_chunk, metadata = content
+                    node_name = metadata["langgraph_node"]
+                    msg_chunk = cast(BaseMessageChunk, msg_chunk)
+                    if node_name == "agent_node":
+                        msg_chunk = cast(AIMessageChunk, msg_chunk)
+                        for tool_call_chunk in msg_chunk.tool_call_chunks:
+                            for frame in shaper.tool_call_chunk(tool_call_chunk):
+                                yield frame
+                        if msg_chunk.content:
+                            for frame in shaper.text(msg_chunk.text):
+                                yield frame
+    except (GeneratorExit, asyncio.CancelledError):
+        # the client went away mid-stream, nothing left to close
+        thinking_started = False
+        RUNS.labels(status="cancelled").inc()
+        raise
+    except Exception:
+        RUNS.labels(status="failed").inc()
+        raise
+    finally:
+        # never leave the client inside a thinking block
+        if thinking_started:
+            for frame in end_thinking(shaper):
+                yield frame
 
     # Send TEXT_MESSAGE_END event after streaming completes
-    if message_started:
-        yield encoder.encode(
-            TextMessageEndEvent(
-                type=EventType.TEXT_MESSAGE_END,
-                message_id=message_id,
-            )
-        )
+    for frame in shaper.end():
+        yield frame
 
-    yield encoder.encode(
+    yield shaper.encode(
         RunFinishedEvent(
             type=EventType.RUN_FINISHED,
             run_id=run_id,
             thread_id=thread_id,
         )
     )
+    shaper.stats.finished_at = time.time()
+    RUNS.labels(status="completed").inc()
@@ -1,27 +1,86 @@
+from collections import OrderedDict
 from typing import Literal, cast
 from app.agent.react_agent.states import AgentState
 from langgraph.runtime import Runtime
 from app.agent.react_agent.context import AppContext
+from app.agent.react_agent.context_window import (
+    model_name_of,
+    select_overflow,
+)
+from app.agent.react_agent.prompt_assembly import assemble_prompt
+from app.agent.react_agent.prompts import CONVERSATION_SUMMARY_PROMPT
 from app.agent.react_agent.tools import TOOLS
+from app.agent.react_agent.transcript import render_transcript
+from app.core.config import settings
+from app.core.telemetry import span
+from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import (
     AIMessage,
+    HumanMessage,
+    RemoveMessage,
 )
+from langchain_core.runnables import Runnable
+
+# tool-bound models per LLM instance, so the tool schemas are only built once
+_llm_with_tools: OrderedDict[int, tuple[BaseChatModel, Runnable]] = OrderedDict()
+_LLM_WITH_TOOLS_MAX_SIZE = 32
+
+
+def get_llm_with_tools(llm: BaseChatModel) -> Runnable:
+    cached = _llm_with_tools.get(id(llm))
+    # the model is kept in the entry, so its id cannot be reused while cached
+    if cached is not None and cached[0] is llm:
+        _llm_with_tools.move_to_end(id(llm))
+        return cached[1]
+    llm_with_tools = llm.bind_tools(
+        tools=TOOLS, parallel_tool_calls=settings.parallel_tool_calls
+    )
+    _llm_with_tools[id(llm)] = (llm, llm_with_tools)
+    if len(_llm_with_tools) > _LLM_WITH_TOOLS_MAX_SIZE:
+        _llm_with_tools.popitem(last=False)
+    return llm_with_tools
 
 
-def agent_node(state: AgentState, runtime: Runtime[AppContext]) -> AgentState:
-    print("\n\nThinking...\n\n")
+async def context_node(state: AgentState, runtime: Runtime[AppContext]) -> AgentState:
+    """
+    Keep the prompt within the model's token budget by folding the oldest turns
+    into the running summary and removing them from the state.
+    """
+    llm = runtime.context.llm
+    overflow = select_overflow(state.messages, state.summary, model_name_of(llm))
+    if not overflow:
+        return AgentState()
+    prompt = CONVERSATION_SUMMARY_PROMPT.format(
+        max_tokens=settings.context_summary_max_tokens,
+        summary=state.summary or "(none)",
+        transcript=render_transcript(
+            overflow,
+            tool_output_max_tokens=settings.reasoning_tool_output_max_tokens,
+            model_name=model_name_of(llm),
+        ),
+    )
+    with span("context_node.summarize", messages=len(overflow)):
+        result = await llm.ainvoke([HumanMessage(content=prompt)])
+    return AgentState(
+        messages=[RemoveMessage(id=message.id) for message in overflow],
+        summary=result.text,
+    )
+
+
+async def agent_node(state: AgentState, runtime: Runtime[AppContext]) -> AgentState:
     messages = state.messages
     if not messages:
         raise Exception("The messages cannot be empty")
-    llm_with_tools = runtime.context.llm.bind_tools(
-        tools=TOOLS, parallel_tool_calls=False
-    )
-    results = llm_with_tools.invoke(messages)
+    llm_with_tools = get_llm_with_tools(runtime.context.llm)
+    with span("agent_node", messages=len(messages)):
+        results = await llm_with_tools.ainvoke(
+            assemble_prompt(messages, state.summary, runtime.context)
+        )
     results = cast(AIMessage, results)
     return AgentState(messages=[results])
 
 
-def router_function(
+async def router_function(
     state: AgentState, runtime: Runtime[AppContext]
 ) -> Literal["tool_node", "__end__"]:
     latest_msg = state.messages[-1]
@@ -0,0 +1,47 @@
+from typing import Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from app.agent.react_agent.context import AppContext
+from app.agent.react_agent.context_window import split_system
+from app.agent.react_agent.prompts import REQUEST_CONTEXT_PROMPT
+
+
+def request_context(context: AppContext) -> str:
+    return REQUEST_CONTEXT_PROMPT.format(
+        current_time=context.current_time or "Unknown",
+        user_location=context.user_location or "Unknown",
+    )
+
+
+def assemble_prompt(
+    messages: Sequence[BaseMessage], summary: str | None, context: AppContext
+) -> list[BaseMessage]:
+    """
+    Order the prompt from the most stable content to the most volatile one, so
+    providers can reuse their prompt cache for the longest possible prefix:
+
+    1. the static system prompt (the tool schemas are sent ahead of it)
+    2. the running summary, which only changes when old turns are folded
+    3. the previous turns, which never change once written
+    4. the per-request context (time, user location), not kept in the state
+    5. the current turn
+    """
+    system, history = split_system(messages)
+    turn_start = next(
+        (
+            i
+            for i in range(len(history) - 1, -1, -1)
+            if isinstance(history[i], HumanMessage)
+        ),
+        len(history),
+    )
+    prompt = list(system)
+    if summary:
+        prompt.append(
+            SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+        )
+    prompt.extend(history[:turn_start])
+    prompt.append(SystemMessage(content=request_context(context)))
+    prompt.extend(history[turn_start:])
+    return prompt
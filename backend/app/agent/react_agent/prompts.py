@@ -1,7 +1,6 @@
+# keep this free of per-request values, it is the cached prefix of every prompt
 REACT_AGENT_SYSTEM_PROMPT = """You are a helpful AI assistant that uses tools to answer questions and complete tasks.
 
-Current Time and Date: {current_time}
-
 When given a task:
 1. Break down complex requests into smaller steps
 2. Use available tools systematically to gather information
@@ -14,3 +13,18 @@ When using tools:
 - Combine tool results with your knowledge when appropriate
 
 Be thorough, accurate, and helpful in your responses."""
+
+REQUEST_CONTEXT_PROMPT = """Current Time and Date: {current_time}
+User Location: {user_location}"""
+
+CONVERSATION_SUMMARY_PROMPT = """Condense the conversation below into a running summary for an AI assistant that will continue it.
+
+Keep facts about the user, their goals, decisions that were made, tool results that are still relevant and any open questions. Drop greetings and repetition. Write at most {max_tokens} tokens.
+
+Current summary:
+{summary}
+
+New messages:
+{transcript}
+
+Updated summary:"""
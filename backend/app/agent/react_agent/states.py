@@ -1,4 +1,4 @@
-from typing import Annotated, Sequence
+from typing import Annotated, Optional, Sequence
 from langchain_core.messages import (
     BaseMessage,
 )
@@ -10,3 +10,5 @@ class AgentState(BaseModel):
     messages: Annotated[Sequence[BaseMessage], add_messages] = Field(
         default_factory=list
     )
+    # running summary of the messages folded out of the context window
+    summary: Optional[str] = None
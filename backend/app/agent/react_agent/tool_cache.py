@@ -0,0 +1,160 @@
+import asyncio
+import json
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from langchain_core.messages import ToolMessage
+from langgraph.prebuilt.tool_node import ToolCallRequest
+from langgraph.types import Command
+
+from app.core.config import settings
+
+ToolResult = ToolMessage | Command
+
+
+@dataclass
+class ToolCacheStats:
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    evictions: int = 0
+
+    def as_dict(self) -> dict[str, int | float]:
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+@dataclass
+class _Entry:
+    message: ToolMessage
+    expires_at: float
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip().lower()
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def _for_call(message: ToolMessage, request: ToolCallRequest, source: str):
+    # the same result answers another tool call, so it needs that call's id
+    return message.model_copy(
+        update={
+            "id": None,
+            "tool_call_id": request.tool_call["id"],
+            "response_metadata": {**message.response_metadata, "cache": source},
+        }
+    )
+
+
+class ToolResultCache:
+    """
+    Result cache for tools that call external services.
+
+    Only the tools listed in `ttls` are cached, each with its own TTL, keyed by
+    the tool name and its normalized arguments. Identical calls arriving while
+    the first one is still running wait for its result instead of hitting the
+    upstream again. Error results are never stored.
+    """
+
+    def __init__(self, ttls: dict[str, float], max_entries: int = 512):
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.stats = ToolCacheStats()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def enabled_for(self, tool_name: str) -> bool:
+        return tool_name in self.ttls
+
+    @staticmethod
+    def key(tool_name: str, args: dict) -> str:
+        return json.dumps(
+            [tool_name, _normalize(args)], sort_keys=True, ensure_ascii=False
+        )
+
+    def _get(self, key: str) -> ToolMessage | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry.message
+
+    def _put(self, key: str, tool_name: str, message: ToolMessage) -> None:
+        self._entries[key] = _Entry(
+            message=message, expires_at=time.monotonic() + self.ttls[tool_name]
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def run(
+        self, request: ToolCallRequest, call: Callable[[], Awaitable[ToolResult]]
+    ) -> ToolResult:
+        tool_name = request.tool_call["name"]
+        key = self.key(tool_name, request.tool_call["args"])
+
+        cached = self._get(key)
+        if cached is not None:
+            self.stats.hits += 1
+            return _for_call(cached, request, "hit")
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats.coalesced += 1
+            try:
+                result = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # the leading call was cancelled, run our own
+                return await call()
+            if isinstance(result, ToolMessage):
+                return _for_call(result, request, "coalesced")
+            return result
+
+        self.stats.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await call()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # retrieve it so an unawaited future does not log a warning
+                future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+        future.set_result(result)
+        if isinstance(result, ToolMessage) and result.status != "error":
+            self._put(key, tool_name, result)
+        return result
+
+    def as_dict(self) -> dict[str, int | float]:
+        return {"entries": len(self._entries), **self.stats.as_dict()}
+
+
+tool_result_cache = ToolResultCache(
+    ttls=settings.tool_cache_ttls, max_entries=settings.tool_cache_max_entries
+)
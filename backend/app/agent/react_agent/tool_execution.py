@@ -0,0 +1,196 @@
+import asyncio
+import json
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langgraph.errors import GraphBubbleUp
+from langgraph.prebuilt.tool_node import ToolCallRequest
+from langgraph.types import Command
+
+from app.agent.react_agent.tool_cache import ToolResultCache, tool_result_cache
+from app.core.config import settings
+from app.core.telemetry import SPAN_ERRORS, SPAN_SECONDS
+
+
+@dataclass
+class ToolLatencyStats:
+    calls: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def record(self, seconds: float, status: str) -> None:
+        self.calls += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        if status == "timeout":
+            self.timeouts += 1
+        elif status == "error":
+            self.errors += 1
+
+    def as_dict(self) -> dict[str, int | float]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "avg_seconds": self.total_seconds / self.calls if self.calls else 0.0,
+            "max_seconds": self.max_seconds,
+        }
+
+
+@dataclass
+class _ToolCallBatch:
+    """
+    Concurrency slots shared by the tool calls of one AIMessage.
+    """
+
+    semaphore: asyncio.Semaphore
+    calls: int = 0
+
+
+def tool_error_message(
+    request: ToolCallRequest, error: str, detail: str, **extra
+) -> ToolMessage:
+    """
+    Error result the model can read, with the reason as a JSON object.
+    """
+    tool_call = request.tool_call
+    return ToolMessage(
+        content=json.dumps({"error": error, "detail": detail, **extra}),
+        name=tool_call["name"],
+        tool_call_id=tool_call["id"],
+        status="error",
+    )
+
+
+class ToolExecutor:
+    """
+    Wraps every tool call of the tool node.
+
+    ToolNode already runs the calls of one AIMessage concurrently; this bounds
+    them with `max_concurrency` per AIMessage, so sessions never wait on each
+    other's slots. A call is cancelled once its timeout expires, counting the
+    time it waited for a slot. Timeouts and exceptions become structured error
+    results instead of failing the run, and the latency of each tool is
+    recorded. Tools enabled in the result
+    cache go through it first.
+    The latency is also attached to the ToolMessage's response_metadata so the
+    breakdown of a single run can be read from its messages.
+
+    Cancellation only interrupts async tools, a sync tool keeps running in its
+    worker thread until it returns.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        default_timeout: float | None = 30,
+        timeouts: dict[str, float] | None = None,
+        cache: ToolResultCache | None = None,
+    ):
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts or {}
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.stats: defaultdict[str, ToolLatencyStats] = defaultdict(ToolLatencyStats)
+        # slots of the tool call batches in flight, by AIMessage id
+        self._batches: dict[str, _ToolCallBatch] = {}
+
+    def timeout_for(self, tool_name: str) -> float | None:
+        return self.timeouts.get(tool_name, self.default_timeout)
+
+    @staticmethod
+    def batch_key(request: ToolCallRequest) -> str:
+        """
+        Id of the AIMessage that requested the call, the call's own id when
+        the message is not found in the state.
+        """
+        tool_call_id = request.tool_call["id"]
+        state = request.state
+        if isinstance(state, dict):
+            messages = state.get("messages", [])
+        else:
+            messages = getattr(state, "messages", [])
+        for message in reversed(messages):
+            if isinstance(message, AIMessage) and any(
+                tool_call["id"] == tool_call_id for tool_call in message.tool_calls
+            ):
+                return message.id or tool_call_id
+        return tool_call_id
+
+    async def __call__(
+        self,
+        request: ToolCallRequest,
+        execute: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command]],
+    ) -> ToolMessage | Command:
+        tool_name = request.tool_call["name"]
+        # cache hits and coalesced calls return without taking a slot
+        if self.cache is not None and self.cache.enabled_for(tool_name):
+            return await self.cache.run(request, lambda: self._run(request, execute))
+        return await self._run(request, execute)
+
+    async def _run(
+        self,
+        request: ToolCallRequest,
+        execute: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command]],
+    ) -> ToolMessage | Command:
+        tool_name = request.tool_call["name"]
+        timeout = self.timeout_for(tool_name)
+        key = self.batch_key(request)
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = _ToolCallBatch(asyncio.Semaphore(self.max_concurrency))
+            self._batches[key] = batch
+        batch.calls += 1
+
+        async def acquire_and_execute() -> ToolMessage | Command:
+            async with batch.semaphore:
+                return await execute(request)
+
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(acquire_and_execute(), timeout)
+            status = getattr(result, "status", "success")
+        except TimeoutError:
+            result = tool_error_message(
+                request,
+                error="timeout",
+                detail=f"{tool_name} did not finish within {timeout} seconds",
+                timeout_seconds=timeout,
+            )
+            status = "timeout"
+        except GraphBubbleUp:
+            # interrupts and parent commands are control flow for the graph
+            raise
+        except Exception as e:
+            # one failing call must not take down the calls running next to it
+            result = tool_error_message(request, error=type(e).__name__, detail=str(e))
+            status = "error"
+        finally:
+            batch.calls -= 1
+            if not batch.calls:
+                self._batches.pop(key, None)
+        elapsed = time.perf_counter() - start
+
+        self.stats[tool_name].record(elapsed, status)
+        SPAN_SECONDS.labels(span=f"tool.{tool_name}").observe(elapsed)
+        if status != "success":
+            SPAN_ERRORS.labels(span=f"tool.{tool_name}").inc()
+        if isinstance(result, ToolMessage):
+            result.response_metadata["latency_seconds"] = round(elapsed, 4)
+        return result
+
+    def as_dict(self) -> dict[str, dict[str, int | float]]:
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+
+tool_executor = ToolExecutor(
+    max_concurrency=settings.tool_max_concurrency,
+    default_timeout=settings.tool_timeout_seconds,
+    timeouts=settings.tool_timeouts,
+    cache=tool_result_cache,
+)
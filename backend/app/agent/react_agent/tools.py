@@ -1,14 +1,19 @@
+import json
 import random
 from typing import Callable, List, Literal
 from datetime import datetime
 from langchain.tools import ToolRuntime
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_community.tools import BraveSearch
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun
+from app.agent.http_pool import shared_http_clients
+from app.agent.react_agent.context_window import model_name_of
+from app.agent.react_agent.transcript import render_transcript
 from app.core.config import settings
 
 
-def get_weather_update(city: str, date: datetime) -> str:
+async def get_weather_update(city: str, date: datetime) -> str:
     """
     Used to get the weather based on the city and the date
     Args:
@@ -24,18 +29,17 @@ def get_weather_update(city: str, date: datetime) -> str:
     return f"It is {weather}: {temp} degrees celcius in {city} at {date}"
 
 
-def get_name_of_user() -> str:
+async def get_name_of_user() -> str:
     """
     Get the name of the current user through accessing the database and session id
     """
     return "Name: Kairus Noah E. Tecson, Occupation: Trashtalker"
 
 
-def do_reasoning(runtime: ToolRuntime) -> str:
+async def do_reasoning(runtime: ToolRuntime) -> str:
     """
     Perform intermediate reasoning step which will call an LLM that has access to the whole conversation history.
     """
-    print("Performing reasoning step...")
     llm = runtime.context.llm
     messages = runtime.state.messages
 
@@ -48,17 +52,70 @@ def do_reasoning(runtime: ToolRuntime) -> str:
     if not isinstance(llm, BaseChatModel):
         raise Exception("LLM should be an instance of BaseChatModel")
 
-    messages = [
+    transcript = render_transcript(
+        messages,
+        summary=runtime.state.summary,
+        tool_output_max_tokens=settings.reasoning_tool_output_max_tokens,
+        model_name=model_name_of(llm),
+    )
+    prompt = [
         HumanMessage(
-            content=f"Based on the previous conversation, please reason and provide your next response. ## Chat Conversation: {str(messages)}"
+            content=f"Based on the previous conversation, please reason and provide your next response. ## Chat Conversation:\n{transcript}"
         )
     ]
-    response: AIMessage = llm.invoke(messages)
-    response = response.content
-    return response
+    # stream the reasoning so the client sees it while it is generated
+    response = []
+    try:
+        async for chunk in llm.astream(prompt):
+            if chunk.text:
+                response.append(chunk.text)
+                runtime.stream_writer({"reasoning_delta": chunk.text})
+    finally:
+        runtime.stream_writer({"reasoning_done": True})
+    return "".join(response)
 
 
-brave_search_tool_builtin = BraveSearch.from_api_key(
+class AsyncBraveSearch(BraveSearch):
+    """
+    BraveSearch with a native async path over the shared HTTP pool, the builtin
+    tool only implements the sync request and would block a worker thread.
+    """
+
+    async def _arun(
+        self,
+        query: str,
+        run_manager: AsyncCallbackManagerForToolRun | None = None,
+    ) -> str:
+        wrapper = self.search_wrapper
+        response = await shared_http_clients.async_client.get(
+            wrapper.base_url,
+            params={**wrapper.search_kwargs, "q": query, "extra_snippets": True},
+            headers={
+                "X-Subscription-Token": wrapper.api_key.get_secret_value(),
+                "Accept": "application/json",
+            },
+        )
+        if response.is_error:
+            raise Exception(f"HTTP error {response.status_code}")
+        results = response.json().get("web", {}).get("results", [])
+        return json.dumps(
+            [
+                {
+                    "title": item.get("title"),
+                    "link": item.get("url"),
+                    "snippet": " ".join(
+                        filter(
+                            None,
+                            [item.get("description"), *item.get("extra_snippets", [])],
+                        )
+                    ),
+                }
+                for item in results
+            ]
+        )
+
+
+brave_search_tool_builtin = AsyncBraveSearch.from_api_key(
     api_key=settings.brave_api_key, search_kwargs={"count": 5}
 )
 
@@ -0,0 +1,52 @@
+import json
+from typing import Sequence
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+from app.agent.react_agent.context_window import truncate_tokens
+
+
+def render_transcript(
+    messages: Sequence[BaseMessage],
+    summary: str | None = None,
+    tool_output_max_tokens: int | None = None,
+    model_name: str | None = None,
+) -> str:
+    """
+    Render the conversation as a plain "role: text" transcript.
+
+    Only the text, the tool calls and the tool results are kept, ids and
+    metadata are dropped. System messages are left out and tool outputs are
+    cut to `tool_output_max_tokens`.
+    """
+    lines = []
+    if summary:
+        lines.append(f"(summary of the earlier conversation) {summary}")
+    tool_names = {}
+    for message in messages:
+        if isinstance(message, SystemMessage):
+            continue
+        if isinstance(message, HumanMessage):
+            lines.append(f"user: {message.text}")
+        elif isinstance(message, AIMessage):
+            if message.text:
+                lines.append(f"assistant: {message.text}")
+            for call in message.tool_calls:
+                tool_names[call["id"]] = call["name"]
+                args = json.dumps(call["args"], ensure_ascii=False, default=str)
+                lines.append(f"assistant called {call['name']}({args})")
+        elif isinstance(message, ToolMessage):
+            output = message.text
+            if tool_output_max_tokens is not None:
+                output = truncate_tokens(output, tool_output_max_tokens, model_name)
+            name = message.name or tool_names.get(message.tool_call_id, "tool")
+            lines.append(f"{name} returned: {output}")
+        elif message.text:
+            lines.append(f"{message.type}: {message.text}")
+    return "\n".join(lines)
@@ -7,6 +7,11 @@ from ag_ui.encoder import EventEncoder
 from ag_ui.core import RunAgentInput
 
 from app.agent.factory import get_default_llm
+from app.agent.llm import LLMFactory
+from app.agent.react_agent.checkpointer import checkpointer
+from app.agent.react_agent.event_stream import recent_streams
+from app.agent.react_agent.tool_cache import tool_result_cache
+from app.agent.react_agent.tool_execution import tool_executor
 
 router = APIRouter(prefix="/chat")
 
@@ -44,3 +49,33 @@ async def send_message(
         ),
         media_type="text/event-stream",
     )
+
+
+@router.get("/llm_pool")
+async def llm_pool_stats() -> dict:
+    """Cached chat models, HTTP pool usage and connection reuse counters"""
+    return LLMFactory.stats()
+
+
+@router.get("/checkpointer")
+async def checkpointer_stats() -> dict:
+    """Checkpoint backend, hot tier and maintenance counters"""
+    return checkpointer.as_dict()
+
+
+@router.get("/tools")
+async def tool_stats() -> dict:
+    """Per-tool call counts, errors, timeouts and latency"""
+    return tool_executor.as_dict()
+
+
+@router.get("/tool_cache")
+async def tool_cache_stats() -> dict:
+    """Tool result cache size, hits, misses and coalesced calls"""
+    return tool_result_cache.as_dict()
+
+
+@router.get("/streams")
+async def stream_stats() -> list[dict]:
+    """Event and byte counts of the most recent response streams"""
+    return [stats.as_dict() for stats in reversed(recent_streams.values())]
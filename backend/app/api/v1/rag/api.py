@@ -1,47 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile
 from fastapi.responses import StreamingResponse
 
-from langchain_openai import OpenAIEmbeddings
-from pymilvus import MilvusClient
+from langchain_core.embeddings import Embeddings
+from pymilvus import AsyncMilvusClient, MilvusClient
 
-from app.services.rag.inference.retriever import retrieve_relevant_chunks
-from client.milvus_client import get_milvus_client
-from langchain_text_splitters import (
-    RecursiveCharacterTextSplitter,
-    TokenTextSplitter,
-    MarkdownHeaderTextSplitter,
+from app.api.v1.rag.models import BatchVectorSearchPost
+from app.core.config import settings
+from app.services.rag.inference.cache import RetrievalCache, get_retrieval_cache
+from app.services.rag.inference.reranker import Reranker, get_reranker
+from app.services.rag.inference.retriever import (
+    aretrieve_relevant_chunks,
+    aretrieve_relevant_chunks_batch,
 )
+from client.milvus_client import get_async_milvus_client, get_milvus_client
 from langchain_core.documents import Document
 
-from app.services.rag.indexing.bi_encoders import get_bi_encoder_model
+from app.services.rag.indexing.bi_encoders import (
+    get_bi_encoder_model,
+    underlying_encoder,
+)
+from app.services.rag.indexing.chunking import get_chunking_strategy
+from app.services.rag.indexing.embedding_cache import CachedEmbeddings
+from app.services.rag.indexing.jobs import (
+    IngestionError,
+    IngestionJob,
+    IngestionJobManager,
+    QueueFullError,
+    get_ingestion_jobs,
+)
+from app.services.rag.indexing.streaming import (
+    read_upload,
+    save_upload,
+    stream_markdown_chunks,
+)
 
 router = APIRouter(prefix="/rag")
 
 
 def token_based_chunker(text: str) -> list[str]:
-    chunker = TokenTextSplitter.from_tiktoken_encoder(
-        encoding_name="o200k_base", chunk_size=10, chunk_overlap=5
-    )
-    return chunker.split_text(text)
+    chunks = get_chunking_strategy("token").split_text(text)
+    return [chunk.page_content for chunk in chunks]
 
 
 def markdown_chunker(text: str) -> list[Document]:
-    headers_to_split_on = [
-        ("#", "Topic"),
-        ("##", "Sub Topic"),
-        ("###", "Sub Sub Topic"),
-    ]
-    chunker = MarkdownHeaderTextSplitter(headers_to_split_on=headers_to_split_on)
-    return chunker.split_text(text)
+    return get_chunking_strategy("markdown_headers").split_text(text)
 
 
-def charac_doc_chunker(document: Document) -> list[Document]:
-    chunk_size = 250
-    chunk_overlap = 30
-    chunker = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size, chunk_overlap=chunk_overlap
-    )
-    return chunker.split_documents(document)
+def charac_doc_chunker(document: list[Document]) -> list[Document]:
+    return get_chunking_strategy("recursive").split_documents(document)
 
 
 @router.post("/sample_chunker")
@@ -51,31 +57,186 @@ async def send_message(
     """Feed raw documents to store into the vector database. This contains the whole indexing process of the RAG system"""
     if file.content_type not in ["text/markdown"]:
         raise HTTPException("The file is invalid")
-    content = await file.read()
-    content = content.decode()
-
-    docs_chunks = markdown_chunker(content)
-    docs_chunks = charac_doc_chunker(docs_chunks)
+    docs_chunks = [
+        chunk
+        async for chunk in stream_markdown_chunks(
+            read_upload(file),
+            get_chunking_strategy("markdown_recursive"),
+            max_section_chars=settings.ingest_stream_max_section_chars,
+        )
+    ]
     return {"total_chunks": len(docs_chunks), "chunks": docs_chunks}
 
 
-@router.post("/ingest")
+@router.post("/ingest", status_code=202)
 async def ingest_document(
-    file: UploadFile, vector_db: MilvusClient = Depends(get_milvus_client)
-):
+    file: UploadFile,
+    jobs: IngestionJobManager = Depends(get_ingestion_jobs),
+) -> dict:
+    """Queue a background job that chunks, embeds and stores the uploaded document"""
     if file.content_type not in ["text/markdown"]:
-        raise HTTPException("The file is invalid")
-    content = await file.read()
-    content = content.decode()
+        raise HTTPException(status_code=400, detail="The file is invalid")
+    # copied to disk so the job can read it section by section after the request
+    path = await save_upload(file)
+    try:
+        job = jobs.submit(
+            source=file.filename or "upload",
+            path=path,
+            strategy=get_chunking_strategy(settings.ingest_chunking_strategy),
+        )
+    except QueueFullError as e:
+        path.unlink(missing_ok=True)
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"job_id": job.job_id, "status": job.status}
+
+
+@router.post("/ingest/stream")
+async def ingest_document_stream(
+    request: Request,
+    source: str = Query(description="Name of the document, re-sending it replaces it"),
+    jobs: IngestionJobManager = Depends(get_ingestion_jobs),
+) -> IngestionJob:
+    """
+    Ingest a markdown request body while it is being uploaded: every section is
+    chunked and embedded as soon as it has arrived, and the response is sent
+    once the whole document is stored
+    """
+    if request.headers.get("content-type", "").split(";")[0] != "text/markdown":
+        raise HTTPException(status_code=400, detail="The file is invalid")
+    size = request.headers.get("content-length")
+    try:
+        job = jobs.register_stream(source, size=int(size) if size else None)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    try:
+        return await jobs.run_stream(
+            job,
+            request.stream(),
+            get_chunking_strategy(settings.ingest_chunking_strategy),
+        )
+    except UnicodeDecodeError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"job_id": job.job_id, "error": f"The file is not UTF-8: {e}"},
+        )
+    except IngestionError as e:
+        raise HTTPException(
+            status_code=502, detail={"job_id": job.job_id, "error": str(e)}
+        )
+
+
+@router.get("/ingest/{job_id}")
+async def get_ingestion_job(
+    job_id: str, jobs: IngestionJobManager = Depends(get_ingestion_jobs)
+) -> IngestionJob:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
+
+
+@router.get("/ingest/{job_id}/events")
+async def stream_ingestion_job(
+    job_id: str, jobs: IngestionJobManager = Depends(get_ingestion_jobs)
+):
+    """Server-sent events stream of the job progress until it completes or fails"""
+    if jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+
+    async def events():
+        async for job in jobs.watch(job_id):
+            yield f"data: {job.model_dump_json()}\n\n"
 
-    docs_chunks = markdown_chunker(content)
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 
 @router.post("/vector_search")
 async def vector_search(
     query: str,
-    encoder: OpenAIEmbeddings = Depends(get_bi_encoder_model),
-    vector_db: MilvusClient = Depends(get_milvus_client),
+    top_k: int | None = Query(default=None, ge=1, le=100),
+    ef: int | None = Query(default=None, ge=1, le=4096, description="HNSW/DISKANN"),
+    nprobe: int | None = Query(default=None, ge=1, le=4096, description="IVF_*"),
+    encoder: Embeddings = Depends(get_bi_encoder_model),
+    vector_db: AsyncMilvusClient = Depends(get_async_milvus_client),
+    cache: RetrievalCache | None = Depends(get_retrieval_cache),
+    reranker: Reranker | None = Depends(get_reranker),
 ) -> dict:
-    chunks = retrieve_relevant_chunks(query=query, encoder=encoder, vector_db=vector_db)
+    chunks = await aretrieve_relevant_chunks(
+        query=query,
+        encoder=encoder,
+        vector_db=vector_db,
+        top_k=top_k,
+        ef=ef,
+        nprobe=nprobe,
+        cache=cache,
+        reranker=reranker,
+    )
     return {"chunks": chunks, "total": len(chunks)}
+
+
+@router.post("/batch_vector_search")
+async def batch_vector_search(
+    body: BatchVectorSearchPost,
+    encoder: Embeddings = Depends(get_bi_encoder_model),
+    vector_db: AsyncMilvusClient = Depends(get_async_milvus_client),
+    cache: RetrievalCache | None = Depends(get_retrieval_cache),
+    reranker: Reranker | None = Depends(get_reranker),
+) -> dict:
+    """Embed all queries in one call and run them as a single multi-vector search"""
+    if not body.queries:
+        raise HTTPException(status_code=400, detail="At least one query is required")
+    results = await aretrieve_relevant_chunks_batch(
+        queries=body.queries,
+        encoder=encoder,
+        vector_db=vector_db,
+        top_k=body.top_k,
+        ef=body.ef,
+        nprobe=body.nprobe,
+        cache=cache,
+        reranker=reranker,
+    )
+    return {
+        "results": [
+            {"query": query, "chunks": hits, "total": len(hits)}
+            for query, hits in zip(body.queries, results)
+        ]
+    }
+
+
+@router.get("/embedding_cache")
+async def embedding_cache_stats(
+    encoder: Embeddings = Depends(get_bi_encoder_model),
+) -> dict:
+    """Hit, miss and eviction counters of the embedding cache"""
+    if not isinstance(encoder, CachedEmbeddings):
+        return {"enabled": False}
+    return {"enabled": True, **encoder.stats.as_dict()}
+
+
+@router.get("/bi_encoder")
+async def bi_encoder_stats(
+    encoder: Embeddings = Depends(get_bi_encoder_model),
+) -> dict:
+    """Batch size and queue wait of the local bi-encoder's dynamic batching"""
+    stats = getattr(underlying_encoder(encoder), "stats", None)
+    if stats is None:
+        return {"local": False}
+    return {"local": True, **stats.as_dict()}
+
+
+@router.get("/reranker")
+async def reranker_stats(reranker: Reranker | None = Depends(get_reranker)) -> dict:
+    """How often reranking scored every candidate within its latency budget"""
+    if reranker is None:
+        return {"enabled": False}
+    return {"enabled": True, **reranker.as_dict()}
+
+
+@router.get("/retrieval_cache")
+async def retrieval_cache_stats(
+    cache: RetrievalCache | None = Depends(get_retrieval_cache),
+) -> dict:
+    """Hit, miss, eviction and invalidation counters of the retrieval cache"""
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats.as_dict()}
@@ -1,7 +1,14 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from ag_ui.core import RunAgentInput
 
 
 class SendMessagePost(BaseModel):
     assistant_id: int
     message: str
+
+
+class BatchVectorSearchPost(BaseModel):
+    queries: list[str]
+    top_k: int | None = Field(default=None, ge=1, le=100)
+    ef: int | None = Field(default=None, ge=1, le=4096)
+    nprobe: int | None = Field(default=None, ge=1, le=4096)
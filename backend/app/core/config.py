@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -20,16 +20,138 @@ class Settings(BaseSettings):
     milvus_uri: Optional[str] = "http://windows-server:19530"
     milvus_db_name: Optional[str] = "chat_man_db"
     collection_name: Optional[str] = "chat_rag"
+    # drop and recreate the collection on startup, wipes every stored vector
+    milvus_recreate_collection: Optional[bool] = False
     postgres_host: Optional[str] = "http://windows-server:5432"
     postgres_db_name: Optional[str] = "chat_man_db"
     postgres_user: Optional[str] = "root"
     postgres_password: Optional[str] = "password"
 
     # this outputs normalized vectors
+    # "text-embedding-*" models go through the OpenAI API, any other name is a
+    # Hugging Face model run locally, e.g. "BAAI/bge-small-en-v1.5" (dim 384)
     bi_encoder_model: Optional[str] = "text-embedding-3-small"
     encoder_dim: Optional[int] = base_dense_vector_dim
+    # local bi-encoder, "cls" pooling for BGE style models, "mean" for MiniLM/E5
+    local_encoder_device: Optional[str] = "cpu"
+    local_encoder_pooling: Literal["mean", "cls"] = "mean"
+    local_encoder_max_length: Optional[int] = 256
+    # torch intra-op threads, None leaves the torch default (all cores)
+    local_encoder_threads: Optional[int] = None
+    # requests arriving within the wait window share one forward pass
+    local_encoder_max_batch_size: Optional[int] = 32
+    local_encoder_max_wait_ms: Optional[float] = 5
+    # instructions of asymmetric models, e.g. "query: " and "passage: " for E5, or
+    # "Represent this sentence for searching relevant passages: " for BGE queries
+    local_encoder_query_prefix: Optional[str] = ""
+    local_encoder_document_prefix: Optional[str] = ""
     # this needs to still be measured whether it is still best to make use of reranking models
+    # Hugging Face cross-encoder, e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2", "" disables reranking
     reranking_model: Optional[str] = ""
+    # ANN candidates fetched per query and scored by the cross-encoder
+    rerank_candidates: Optional[int] = 20
+    rerank_batch_size: Optional[int] = 16
+    # per-request scoring budget, unscored candidates keep their ANN order
+    rerank_budget_ms: Optional[float] = 200
+    rerank_max_length: Optional[int] = 512
+    rerank_device: Optional[str] = "cpu"
+
+    # shared HTTP connection pool of the chat models
+    llm_max_connections: Optional[int] = 100
+    llm_max_keepalive_connections: Optional[int] = 20
+    llm_keepalive_expiry: Optional[float] = 60
+    # requires the h2 package (httpx[http2])
+    llm_http2: Optional[bool] = False
+
+    # vector index, changing these requires the collection to be rebuilt
+    vector_index_type: Literal["HNSW", "IVF_FLAT", "IVF_SQ8", "IVF_PQ", "DISKANN"] = (
+        "HNSW"
+    )
+    vector_metric_type: Optional[str] = "COSINE"
+    hnsw_m: Optional[int] = 16
+    hnsw_ef_construction: Optional[int] = 200
+    ivf_nlist: Optional[int] = 1024
+    # number of sub-quantizers, has to divide encoder_dim
+    ivf_pq_m: Optional[int] = 64
+    ivf_pq_nbits: Optional[int] = 8
+
+    # default search parameters, overridable per request
+    search_top_k: Optional[int] = 5
+    hnsw_ef: Optional[int] = 64
+    ivf_nprobe: Optional[int] = 16
+    diskann_search_list: Optional[int] = 100
+
+    # retrieval result cache, the semantic tier is disabled when the threshold is unset
+    retrieval_cache_enabled: Optional[bool] = True
+    retrieval_cache_max_entries: Optional[int] = 1024
+    retrieval_cache_ttl_seconds: Optional[float] = 300
+    retrieval_cache_semantic_threshold: Optional[float] = None
+
+    # content-addressed embedding cache, set the path to "" to keep it in memory only
+    embedding_cache_enabled: Optional[bool] = True
+    embedding_cache_path: Optional[str] = ".cache/embeddings.sqlite"
+    embedding_cache_max_entries: Optional[int] = 10_000
+    # least recently used vectors are dropped from the disk tier beyond this
+    embedding_cache_max_disk_entries: Optional[int] = 200_000
+
+    # bulk ingestion pipeline (embedding + insert)
+    ingest_batch_size: Optional[int] = 256
+    # keep well below the embedding API's per-request token limit
+    ingest_batch_max_tokens: Optional[int] = 100_000
+    ingest_max_concurrency: Optional[int] = 4
+    ingest_max_retries: Optional[int] = 3
+    # chunking strategy of uploaded documents, see indexing/chunking.py. Uploads
+    # are chunked section by section, so it must be header aligned
+    # (markdown_headers or markdown_recursive)
+    ingest_chunking_strategy: Optional[str] = "markdown_recursive"
+    # background ingestion jobs behind /rag/ingest
+    ingest_workers: Optional[int] = 2
+    ingest_queue_size: Optional[int] = 32
+    # uploads ingested while they stream in (/rag/ingest/stream), and the largest
+    # markdown section held in memory before it is cut
+    ingest_max_streams: Optional[int] = 2
+    ingest_stream_max_section_chars: Optional[int] = 64_000
+
+    # agent checkpoints, "sqlite" is shared by the workers of one host,
+    # "postgres" uses the postgres_* settings above
+    checkpointer_backend: Literal["memory", "sqlite", "postgres"] = "sqlite"
+    checkpointer_sqlite_path: Optional[str] = ".cache/checkpoints.sqlite"
+    checkpointer_postgres_pool_size: Optional[int] = 10
+    # threads without a new checkpoint for this long are deleted, None keeps them
+    checkpointer_thread_ttl_seconds: Optional[float] = 7 * 24 * 3600
+    # checkpoints kept per thread after compaction, None keeps the full history
+    checkpointer_keep_last: Optional[int] = 20
+    checkpointer_maintenance_interval: Optional[float] = 600
+    # in-process tier holding the latest checkpoint of recently active threads
+    checkpointer_hot_max_threads: Optional[int] = 256
+    checkpointer_hot_ttl_seconds: Optional[float] = 5
+
+    # prompt token budget of the agent, older turns are folded into a summary
+    context_max_tokens: Optional[int] = 12_000
+    # per-model budgets, e.g. {"gpt-4o-mini": 32000}
+    context_model_max_tokens: dict[str, int] = {}
+    # share of the budget kept verbatim once the history is summarized
+    context_keep_ratio: Optional[float] = 0.5
+    context_summary_max_tokens: Optional[int] = 512
+    # tool outputs longer than this are cut in the transcripts given to do_reasoning
+    # and to the summarizer
+    reasoning_tool_output_max_tokens: Optional[int] = 500
+
+    # let the model request several tool calls at once, tool_node runs them concurrently
+    parallel_tool_calls: Optional[bool] = False
+    # concurrent calls of one model message, other messages get their own slots
+    tool_max_concurrency: Optional[int] = 4
+    # None disables the timeout, tool_timeouts overrides it per tool name, the
+    # time a call waits for a slot counts against it
+    tool_timeout_seconds: Optional[float] = 30
+    tool_timeouts: dict[str, float] = {"do_reasoning": 120}
+    # result cache TTL per tool name, tools that are not listed are never cached
+    tool_cache_ttls: dict[str, float] = {"brave_search": 300}
+    tool_cache_max_entries: Optional[int] = 512
+
+    # text deltas are merged into one SSE frame per window, 0 sends every chunk
+    stream_text_flush_ms: Optional[float] = 50
+    stream_text_flush_bytes: Optional[int] = 512
 
 
 settings = Settings()
@@ -0,0 +1,122 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+logger = logging.getLogger("chat_man")
+
+# ids of the agent run being served, set once per request and inherited by
+# every task the graph spawns for it
+thread_id_var: ContextVar[str | None] = ContextVar("thread_id", default=None)
+run_id_var: ContextVar[str | None] = ContextVar("run_id", default=None)
+
+_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+
+SPAN_SECONDS = Histogram(
+    "chat_man_span_seconds",
+    "Duration of instrumented operations",
+    ["span"],
+    buckets=_LATENCY_BUCKETS,
+)
+SPAN_ERRORS = Counter(
+    "chat_man_span_errors_total", "Instrumented operations that raised", ["span"]
+)
+TIME_TO_FIRST_EVENT = Histogram(
+    "chat_man_time_to_first_event_seconds",
+    "Time from the start of a chat run to its first agent event",
+    buckets=_LATENCY_BUCKETS,
+)
+TIME_TO_FIRST_TOKEN = Histogram(
+    "chat_man_time_to_first_token_seconds",
+    "Time from the start of a chat run to its first text delta",
+    buckets=_LATENCY_BUCKETS,
+)
+RUNS = Counter("chat_man_runs_total", "Chat runs by outcome", ["status"])
+STREAM_EVENTS = Counter("chat_man_stream_events_total", "SSE events sent")
+STREAM_BYTES = Counter("chat_man_stream_bytes_total", "SSE bytes sent")
+LLM_TOKENS = Counter(
+    "chat_man_llm_tokens_total", "Tokens used by the agent model", ["kind"]
+)
+RERANKS = Counter(
+    "chat_man_reranks_total",
+    "Rerank requests by whether every candidate was scored within the budget",
+    ["outcome"],
+)
+EMBED_BATCH_SIZE = Histogram(
+    "chat_man_embed_batch_size",
+    "Texts per forward pass of the local bi-encoder",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+EMBED_QUEUE_WAIT = Histogram(
+    "chat_man_embed_queue_wait_seconds",
+    "Time an embedding request waited for its batch to start",
+    buckets=_LATENCY_BUCKETS,
+)
+
+
+def bind_run(thread_id: str | None, run_id: str | None) -> None:
+    thread_id_var.set(thread_id)
+    run_id_var.set(run_id)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[None]:
+    """
+    Time a block into `chat_man_span_seconds{span=name}` and emit a debug log
+    line carrying the current thread_id and run_id.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        SPAN_ERRORS.labels(span=name).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        SPAN_SECONDS.labels(span=name).observe(elapsed)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "span=%s duration_ms=%.1f thread_id=%s run_id=%s %s",
+                name,
+                elapsed * 1000,
+                thread_id_var.get(),
+                run_id_var.get(),
+                " ".join(f"{key}={value}" for key, value in attributes.items()),
+            )
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Prometheus exposition of every metric. With several workers, set
+    PROMETHEUS_MULTIPROC_DIR so the values of all of them are aggregated.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,22 +1,46 @@
 from contextlib import asynccontextmanager
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, Response
 from starlette.middleware.cors import CORSMiddleware
 
-from app.services.rag.indexing.bi_encoders import get_bi_encoder_model
+from app.agent.llm import LLMFactory
+from app.agent.react_agent.checkpointer import open_checkpointer
+from app.core.telemetry import render_metrics
+from app.services.rag.indexing.bi_encoders import (
+    check_bi_encoder_dim,
+    get_bi_encoder_model,
+)
+from app.core.config import settings
+from app.services.rag.indexing.chunking import get_chunking_strategy
+from app.services.rag.indexing.jobs import ingestion_jobs
+from app.services.rag.indexing.streaming import check_streaming_strategy
 from app.utils.load_default_data import load_default_data
-from client.milvus_client import get_milvus_client, initial_setup
+from client.milvus_client import (
+    close_async_milvus_client,
+    get_milvus_client,
+    initial_setup,
+)
 from .api.v1.main import api_router as api_router_v1
 from .api.v2.main import api_router as api_router_v2
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
+    # a dimension mismatch would otherwise only surface on the first insert
+    check_bi_encoder_dim(get_bi_encoder_model())
+    # uploads are chunked section by section as they are read
+    check_streaming_strategy(get_chunking_strategy(settings.ingest_chunking_strategy))
     vector_db = get_milvus_client()
     initial_setup(vector_db)
 
     # print("[INFO] Load default dataset for testing")
-    # load_default_data(embed=Depends(get_bi_encoder_model), vector_db=vector_db)
-    yield
+    # await load_default_data(encoder=get_bi_encoder_model(), vector_db=vector_db)
+
+    ingestion_jobs.start(encoder=get_bi_encoder_model(), vector_db=vector_db)
+    async with open_checkpointer():
+        yield
+    await ingestion_jobs.stop()
+    await close_async_milvus_client()
+    await LLMFactory.aclose()
 
 
 app = FastAPI(
@@ -40,3 +64,10 @@ app.include_router(api_router_v2)
 @app.get("/health", tags=["Health"])
 async def health_check():
     return {"status": "ok"}
+
+
+@app.get("/metrics", tags=["Health"])
+async def metrics():
+    """Prometheus metrics: span latencies, time to first token, runs and stream sizes"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
@@ -1,11 +1,94 @@
+from functools import lru_cache
+
+from langchain_core.embeddings import Embeddings
 from langchain_openai.embeddings import OpenAIEmbeddings
 
 from app.core.config import settings
+from app.services.rag.indexing.embedding_cache import (
+    CachedEmbeddings,
+    SQLiteVectorStore,
+)
+
+
+def is_local_model(model_name: str) -> bool:
+    return not model_name.startswith("text-embedding-")
+
 
+def _local_encoder() -> Embeddings:
+    # torch and transformers are only loaded when a local model is configured
+    import torch
 
-def get_bi_encoder_model() -> OpenAIEmbeddings:
-    return OpenAIEmbeddings(
-        api_key=settings.openai_api_key,
-        model=settings.bi_encoder_model,
-        dimensions=settings.encoder_dim,
+    from app.services.rag.indexing.local_encoder import (
+        BatchingEmbeddings,
+        TransformerEncoder,
     )
+
+    if settings.local_encoder_threads:
+        torch.set_num_threads(settings.local_encoder_threads)
+    encoder = TransformerEncoder(
+        model_name=settings.bi_encoder_model,
+        device=settings.local_encoder_device,
+        pooling=settings.local_encoder_pooling,
+        max_length=settings.local_encoder_max_length,
+        batch_size=settings.local_encoder_max_batch_size,
+    )
+    return BatchingEmbeddings(
+        encoder=encoder,
+        max_batch_size=settings.local_encoder_max_batch_size,
+        max_wait_ms=settings.local_encoder_max_wait_ms,
+        query_prefix=settings.local_encoder_query_prefix,
+        document_prefix=settings.local_encoder_document_prefix,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_bi_encoder_model() -> Embeddings:
+    """
+    Get the process-wide bi-encoder. Embeddings are cached by the hash of the
+    text, model name and dimension, so unchanged text is never embedded twice.
+    """
+    if is_local_model(settings.bi_encoder_model):
+        encoder = _local_encoder()
+    else:
+        encoder = OpenAIEmbeddings(
+            api_key=settings.openai_api_key,
+            model=settings.bi_encoder_model,
+            dimensions=settings.encoder_dim,
+        )
+    if not settings.embedding_cache_enabled:
+        return encoder
+
+    disk_store = None
+    if settings.embedding_cache_path:
+        disk_store = SQLiteVectorStore(
+            settings.embedding_cache_path,
+            max_entries=settings.embedding_cache_max_disk_entries,
+        )
+    return CachedEmbeddings(
+        underlying=encoder,
+        namespace=f"{settings.bi_encoder_model}:{settings.encoder_dim}",
+        max_memory_entries=settings.embedding_cache_max_entries,
+        disk_store=disk_store,
+    )
+
+
+def underlying_encoder(encoder: Embeddings) -> Embeddings:
+    return encoder.underlying if isinstance(encoder, CachedEmbeddings) else encoder
+
+
+def check_bi_encoder_dim(encoder: Embeddings) -> None:
+    """
+    Embed a probe text with a local model and fail startup when its output
+    dimension does not match the collection's `encoder_dim`. OpenAI models are
+    asked for `encoder_dim` dimensions, so they are not probed.
+    """
+    if not is_local_model(settings.bi_encoder_model):
+        return
+    dim = len(underlying_encoder(encoder).embed_query("dimension check"))
+    if dim != settings.encoder_dim:
+        raise ValueError(
+            f"{settings.bi_encoder_model} outputs {dim} dimensions but encoder_dim "
+            f"is {settings.encoder_dim}. Set encoder_dim={dim}, the collection is "
+            "rebuilt on the next start."
+        )
+    print(f"[INFO] Local bi-encoder {settings.bi_encoder_model} loaded, dim={dim}")
@@ -1,17 +1,23 @@
-from langchain_text_splitters import MarkdownTextSplitter, TextSplitter
 from langchain_core.documents import Document
 
-md_chunker = MarkdownTextSplitter()
+from app.services.rag.indexing.chunking import ChunkingStrategy, get_chunking_strategy
 
 
-def get_md_chunker() -> TextSplitter:
-    return md_chunker
+def get_md_chunker() -> ChunkingStrategy:
+    return get_chunking_strategy("markdown")
 
 
-# TODO: transform this into a strategy class instead
-def chunk_texts(text: str, chunker: TextSplitter) -> list[str]:
-    return chunker.split_text(text)
+def _resolve(strategy: ChunkingStrategy | str) -> ChunkingStrategy:
+    if isinstance(strategy, str):
+        return get_chunking_strategy(strategy)
+    return strategy
 
 
-def chunk_documents(docs: Document, chunker: TextSplitter) -> list[Document]:
-    return chunker.split_documents(docs)
+def chunk_texts(text: str, strategy: ChunkingStrategy | str) -> list[str]:
+    return [chunk.page_content for chunk in _resolve(strategy).split_text(text)]
+
+
+def chunk_documents(
+    docs: list[Document], strategy: ChunkingStrategy | str
+) -> list[Document]:
+    return _resolve(strategy).split_documents(docs)
@@ -0,0 +1,248 @@
+import os
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from itertools import batched
+from typing import Any, Callable, Iterable, Iterator
+
+from langchain_core.documents import Document
+from langchain_text_splitters import (
+    MarkdownHeaderTextSplitter,
+    MarkdownTextSplitter,
+    RecursiveCharacterTextSplitter,
+    TextSplitter,
+    TokenTextSplitter,
+)
+
+MARKDOWN_HEADERS = [
+    ("#", "Topic"),
+    ("##", "Sub Topic"),
+    ("###", "Sub Sub Topic"),
+]
+
+
+class ChunkingStrategy(ABC):
+    """
+    A named way of cutting text into chunks. Strategies hold their splitters,
+    so building one once and reusing it avoids re-creating splitters (and
+    tokenizer lookups) on every call.
+    """
+
+    # every chunk stays within one markdown section, so a document can be chunked
+    # section by section with the same result (see streaming.py)
+    header_aligned = False
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def split_text(self, text: str) -> list[Document]:
+        return self.split_documents([Document(page_content=text)])
+
+    @abstractmethod
+    def split_documents(self, docs: Iterable[Document]) -> list[Document]: ...
+
+
+class SplitterStrategy(ChunkingStrategy):
+    """
+    Any langchain TextSplitter as a strategy.
+    """
+
+    def __init__(self, name: str, splitter: TextSplitter):
+        super().__init__(name)
+        self.splitter = splitter
+
+    def split_documents(self, docs: Iterable[Document]) -> list[Document]:
+        return self.splitter.split_documents(list(docs))
+
+
+class MarkdownHeaderStrategy(ChunkingStrategy):
+    """
+    One chunk per markdown section, the headers above it become metadata.
+    """
+
+    header_aligned = True
+
+    def __init__(self, name: str, headers: list[tuple[str, str]] | None = None):
+        super().__init__(name)
+        self.splitter = MarkdownHeaderTextSplitter(
+            headers_to_split_on=headers or MARKDOWN_HEADERS
+        )
+
+    def split_documents(self, docs: Iterable[Document]) -> list[Document]:
+        chunks = []
+        for doc in docs:
+            for section in self.splitter.split_text(doc.page_content):
+                section.metadata = {**doc.metadata, **section.metadata}
+                chunks.append(section)
+        return chunks
+
+
+class PipelineStrategy(ChunkingStrategy):
+    """
+    Strategies applied one after the other, each to the chunks of the previous.
+    """
+
+    def __init__(self, name: str, steps: list[ChunkingStrategy]):
+        super().__init__(name)
+        self.steps = steps
+
+    @property
+    def header_aligned(self) -> bool:
+        # later steps only cut the chunks of the first one further
+        return bool(self.steps) and self.steps[0].header_aligned
+
+    def split_documents(self, docs: Iterable[Document]) -> list[Document]:
+        chunks = list(docs)
+        for step in self.steps:
+            chunks = step.split_documents(chunks)
+        return chunks
+
+
+def markdown_strategy(chunk_size: int = 4000, chunk_overlap: int = 200):
+    return SplitterStrategy(
+        "markdown",
+        MarkdownTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap),
+    )
+
+
+def recursive_strategy(chunk_size: int = 250, chunk_overlap: int = 30):
+    return SplitterStrategy(
+        "recursive",
+        RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        ),
+    )
+
+
+def token_strategy(
+    chunk_size: int = 10, chunk_overlap: int = 5, encoding_name: str = "o200k_base"
+):
+    return SplitterStrategy(
+        "token",
+        TokenTextSplitter.from_tiktoken_encoder(
+            encoding_name=encoding_name,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+        ),
+    )
+
+
+def markdown_headers_strategy(headers: list[tuple[str, str]] | None = None):
+    return MarkdownHeaderStrategy("markdown_headers", headers)
+
+
+def markdown_recursive_strategy(chunk_size: int = 250, chunk_overlap: int = 30):
+    """
+    Markdown sections first, then sections longer than `chunk_size` are cut
+    with the recursive character splitter. Used by /rag/ingest.
+    """
+    return PipelineStrategy(
+        "markdown_recursive",
+        [
+            markdown_headers_strategy(),
+            recursive_strategy(chunk_size=chunk_size, chunk_overlap=chunk_overlap),
+        ],
+    )
+
+
+StrategyFactory = Callable[..., ChunkingStrategy]
+_factories: dict[str, StrategyFactory] = {
+    "markdown": markdown_strategy,
+    "recursive": recursive_strategy,
+    "token": token_strategy,
+    "markdown_headers": markdown_headers_strategy,
+    "markdown_recursive": markdown_recursive_strategy,
+}
+
+
+def register_strategy(name: str, factory: StrategyFactory) -> None:
+    """
+    Make a strategy available by name. Register at import time of a module the
+    worker processes also import, otherwise the batch API cannot resolve it.
+    """
+    _factories[name] = factory
+    get_chunking_strategy.cache_clear()
+
+
+def available_strategies() -> list[str]:
+    return sorted(_factories)
+
+
+def create_strategy(name: str, **params) -> ChunkingStrategy:
+    """
+    A new instance of the named strategy with non-default parameters.
+    """
+    if name not in _factories:
+        raise KeyError(
+            f"Unknown chunking strategy {name!r}, available: {available_strategies()}"
+        )
+    return _factories[name](**params)
+
+
+@lru_cache(maxsize=None)
+def get_chunking_strategy(name: str) -> ChunkingStrategy:
+    """
+    The shared instance of the named strategy with its default parameters,
+    built on first use. The token strategy loads its tiktoken encoding then.
+    """
+    return create_strategy(name)
+
+
+# turns a raw corpus item into a document, None skips the item
+Prepare = Callable[[Any], Document | None]
+
+
+def _chunk_batch(
+    strategy: str, items: tuple, prepare: Prepare | None = None
+) -> list[Document]:
+    # runs in the worker processes, which build their own strategy instance once
+    if prepare is not None:
+        items = tuple(doc for doc in map(prepare, items) if doc is not None)
+    return get_chunking_strategy(strategy).split_documents(items)
+
+
+def chunk_documents_parallel(
+    docs: Iterable,
+    strategy: str = "markdown_recursive",
+    workers: int | None = None,
+    batch_size: int = 64,
+    prepare: Prepare | None = None,
+) -> Iterator[Document]:
+    """
+    Chunk documents across a process pool and yield the chunks in input order.
+
+    Documents are sent `batch_size` at a time and at most two batches per worker
+    are in flight, so a lazily produced corpus is never held in memory as a
+    whole. Stopping the iteration cancels the batches not yet started.
+
+    With `prepare`, `docs` holds raw items (e.g. CSV rows) that the workers turn
+    into documents before chunking, so parsing is spread across the cores too.
+    It must be a picklable module-level function.
+    """
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending: deque[Future[list[Document]]] = deque()
+    try:
+        for batch in batched(docs, batch_size):
+            pending.append(pool.submit(_chunk_batch, strategy, batch, prepare))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def chunk_texts_parallel(
+    texts: Iterable[str],
+    strategy: str = "markdown_recursive",
+    workers: int | None = None,
+    batch_size: int = 64,
+) -> Iterator[Document]:
+    return chunk_documents_parallel(
+        (Document(page_content=text) for text in texts),
+        strategy=strategy,
+        workers=workers,
+        batch_size=batch_size,
+    )
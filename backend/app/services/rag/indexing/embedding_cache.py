@@ -0,0 +1,274 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Literal
+
+from langchain_core.embeddings import Embeddings
+
+
+@dataclass
+class EmbeddingCacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    disk_evictions: int = 0
+
+    def as_dict(self) -> dict[str, int | float]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "disk_evictions": self.disk_evictions,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups
+            if lookups
+            else 0.0,
+        }
+
+
+class SQLiteVectorStore:
+    """
+    Disk tier of the embedding cache. Vectors are stored as float32 blobs keyed
+    by their content hash, so the cache survives restarts. Beyond `max_entries`
+    the least recently used vectors are deleted.
+    """
+
+    def __init__(self, path: str, max_entries: int | None = None):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        # caches written before the size cap lack the column
+        columns = {
+            row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")
+        }
+        if "used_at" not in columns:
+            self._conn.execute(
+                "ALTER TABLE embeddings ADD COLUMN used_at REAL NOT NULL DEFAULT 0"
+            )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_used_at ON embeddings (used_at)"
+        )
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        found: dict[str, list[float]] = {}
+        with self._lock:
+            # stay below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found and self.max_entries:
+                self._conn.executemany(
+                    "UPDATE embeddings SET used_at = ? WHERE key = ?",
+                    [(time.time(), key) for key in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: dict[str, list[float]]) -> None:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, used_at) VALUES (?, ?, ?)",
+                [
+                    (key, array("f", vector).tobytes(), now)
+                    for key, vector in items.items()
+                ],
+            )
+            self._size += cursor.rowcount
+            if self.max_entries and self._size > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        # trim a tenth below the cap so eviction does not run on every write
+        target = self.max_entries - self.max_entries // 10
+        cursor = self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY used_at LIMIT ?)",
+            (max(self._size - target, 0),),
+        )
+        self.evictions += cursor.rowcount
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+EmbeddingKind = Literal["document", "query"]
+
+
+async def aembed_queries(encoder: Embeddings, texts: list[str]) -> list[list[float]]:
+    """
+    Embed several queries in one call through the encoder's query path.
+    Encoders without a batched query method embed queries like documents.
+    """
+    if hasattr(encoder, "aembed_queries"):
+        return await encoder.aembed_queries(texts)
+    return await encoder.aembed_documents(texts)
+
+
+def _embed_queries(encoder: Embeddings, texts: list[str]) -> list[list[float]]:
+    return [encoder.embed_query(text) for text in texts]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-addressed cache in front of an embedding model.
+
+    Lookups go through an in-process LRU first and then the disk tier; only the
+    remaining misses are sent to the underlying model, de-duplicated, in one call.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        namespace: str,
+        max_memory_entries: int = 10_000,
+        disk_store: SQLiteVectorStore | None = None,
+    ):
+        self.underlying = underlying
+        self.namespace = namespace
+        self.max_memory_entries = max_memory_entries
+        self.disk_store = disk_store
+        self.stats = EmbeddingCacheStats()
+        self._memory: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, text: str, kind: EmbeddingKind) -> str:
+        # asymmetric models embed a query differently from the same text as a
+        # document. Document keys keep their original form so existing disk
+        # caches stay valid
+        prefix = self.namespace if kind == "document" else f"{self.namespace}\0{kind}"
+        return hashlib.sha256(f"{prefix}\0{text}".encode()).hexdigest()
+
+    def _remember(self, key: str, vector: list[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _lookup_memory(self, keys: list[str]) -> dict[str, list[float]]:
+        found: dict[str, list[float]] = {}
+        with self._lock:
+            for key in keys:
+                if key in found:
+                    continue
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+        return found
+
+    def _store(self, found: dict[str, list[float]], from_disk: bool) -> None:
+        with self._lock:
+            for key, vector in found.items():
+                self._remember(key, vector)
+        if not from_disk and self.disk_store is not None:
+            self.disk_store.put_many(found)
+            self.stats.disk_evictions = self.disk_store.evictions
+
+    def _count(self, keys: list[str], memory: dict, disk: dict) -> None:
+        with self._lock:
+            for key in keys:
+                if key in memory:
+                    self.stats.memory_hits += 1
+                elif key in disk:
+                    self.stats.disk_hits += 1
+                else:
+                    self.stats.misses += 1
+
+    def _lookup_disk(self, keys: list[str]) -> dict[str, list[float]]:
+        if self.disk_store is None or not keys:
+            return {}
+        found = self.disk_store.get_many(keys)
+        self._store(found, from_disk=True)
+        return found
+
+    def _missing(self, texts: list[str], keys: list[str], found: dict) -> dict:
+        # unique texts that still need to be embedded, keyed by their hash
+        return {key: text for text, key in zip(texts, keys) if key not in found}
+
+    def _embed(
+        self,
+        texts: list[str],
+        kind: EmbeddingKind,
+        compute: Callable[[list[str]], list[list[float]]],
+    ) -> list[list[float]]:
+        keys = [self._key(text, kind) for text in texts]
+        memory = self._lookup_memory(keys)
+        disk = self._lookup_disk(list({k for k in keys if k not in memory}))
+        self._count(keys, memory, disk)
+        found = memory | disk
+
+        missing = self._missing(texts, keys, found)
+        if missing:
+            vectors = compute(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed, from_disk=False)
+            found |= computed
+        return [found[key] for key in keys]
+
+    async def _aembed(
+        self,
+        texts: list[str],
+        kind: EmbeddingKind,
+        compute: Callable[[list[str]], Awaitable[list[list[float]]]],
+    ) -> list[list[float]]:
+        keys = [self._key(text, kind) for text in texts]
+        memory = self._lookup_memory(keys)
+        disk = await asyncio.to_thread(
+            self._lookup_disk, list({k for k in keys if k not in memory})
+        )
+        self._count(keys, memory, disk)
+        found = memory | disk
+
+        missing = self._missing(texts, keys, found)
+        if missing:
+            vectors = await compute(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self._store, computed, False)
+            found |= computed
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed(texts, "document", self.underlying.embed_documents)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self._aembed(texts, "document", self.underlying.aembed_documents)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(
+            [text], "query", lambda texts: _embed_queries(self.underlying, texts)
+        )[0]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_queries([text]))[0]
+
+    async def aembed_queries(self, texts: list[str]) -> list[list[float]]:
+        return await self._aembed(
+            texts, "query", lambda texts: aembed_queries(self.underlying, texts)
+        )
@@ -0,0 +1,261 @@
+import asyncio
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Literal
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from pydantic import BaseModel, Field
+from pymilvus import MilvusClient
+
+from app.core.config import settings
+from app.services.rag.indexing.chunking import ChunkingStrategy
+from app.services.rag.indexing.pipeline import IngestionStats, sync_document
+from app.services.rag.indexing.streaming import read_file, stream_markdown_chunks
+
+JobStatus = Literal["queued", "running", "completed", "failed"]
+
+
+class IngestionJob(BaseModel):
+    job_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    source: str
+    status: JobStatus = "queued"
+    # chunks cut so far, final once the whole document has been read
+    chunks_total: int = 0
+    bytes_read: int = 0
+    bytes_total: int | None = None
+    chunks_processed: int = 0
+    chunks_embedded: int = 0
+    chunks_inserted: int = 0
+    chunks_unchanged: int = 0
+    chunks_deleted: int = 0
+    failed_batches: int = 0
+    error: str | None = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: datetime | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class IngestionError(Exception):
+    pass
+
+
+class IngestionJobManager:
+    """
+    Runs document ingestion in the background.
+
+    Jobs wait in a bounded queue and a fixed number of workers process them, so
+    upload spikes are rejected early instead of piling embedding work onto the
+    same event loop that serves chat traffic.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        queue_size: int = 32,
+        max_finished_jobs: int = 256,
+        max_streams: int = 2,
+    ):
+        self.workers = workers
+        self.max_streams = max_streams
+        self._streams = 0
+        self.max_finished_jobs = max_finished_jobs
+        self._queue: asyncio.Queue[tuple[IngestionJob, Path, ChunkingStrategy]] = (
+            asyncio.Queue(maxsize=queue_size)
+        )
+        self._jobs: OrderedDict[str, IngestionJob] = OrderedDict()
+        self._changed: dict[str, asyncio.Event] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._encoder: Embeddings | None = None
+        self._vector_db: MilvusClient | None = None
+
+    def start(self, encoder: Embeddings, vector_db: MilvusClient) -> None:
+        self._encoder = encoder
+        self._vector_db = vector_db
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"ingestion-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(
+        self, source: str, path: Path, strategy: ChunkingStrategy
+    ) -> IngestionJob:
+        """
+        Queue the markdown file at `path` for ingestion. The job deletes the
+        file once it is done with it.
+        """
+        job = IngestionJob(source=source, bytes_total=path.stat().st_size)
+        try:
+            self._queue.put_nowait((job, path, strategy))
+        except asyncio.QueueFull:
+            raise QueueFullError("Ingestion queue is full, try again later")
+        self._jobs[job.job_id] = job
+        self._changed[job.job_id] = asyncio.Event()
+        self._prune()
+        return job
+
+    def register_stream(self, source: str, size: int | None = None) -> IngestionJob:
+        """
+        Track a document ingested while it is being uploaded. It runs in the
+        request instead of the queue, so it is rejected when `max_streams`
+        uploads are already being ingested.
+        """
+        if self._streams >= self.max_streams:
+            raise QueueFullError("Too many streaming ingestions, try again later")
+        self._streams += 1
+        job = IngestionJob(source=source, bytes_total=size)
+        self._jobs[job.job_id] = job
+        self._changed[job.job_id] = asyncio.Event()
+        self._prune()
+        return job
+
+    async def run_stream(
+        self, job: IngestionJob, data: AsyncIterable[bytes], strategy: ChunkingStrategy
+    ) -> IngestionJob:
+        """
+        Ingest the markdown bytes of a registered stream as they arrive. Errors
+        are recorded on the job and raised again.
+        """
+        try:
+            await self._ingest_markdown(job, data, strategy)
+        finally:
+            self._streams -= 1
+        return job
+
+    def get(self, job_id: str) -> IngestionJob | None:
+        return self._jobs.get(job_id)
+
+    async def watch(self, job_id: str) -> AsyncIterator[IngestionJob]:
+        """
+        Yield a snapshot of the job every time its progress changes, until it is done.
+        """
+        job = self._jobs.get(job_id)
+        while job is not None:
+            # grab the event before yielding so no update is missed meanwhile,
+            # a job pruned in between has no event and no further updates
+            changed = self._changed.get(job_id)
+            yield job.model_copy()
+            if job.done or changed is None:
+                return
+            await changed.wait()
+
+    def _notify(self, job: IngestionJob) -> None:
+        # swap the event so that every waiter wakes up exactly once per change
+        event = self._changed.get(job.job_id)
+        if event is not None:
+            self._changed[job.job_id] = asyncio.Event()
+            event.set()
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[: max(len(finished) - self.max_finished_jobs, 0)]:
+            del self._jobs[job_id]
+            # wake the watchers so they send the final state and stop
+            event = self._changed.pop(job_id, None)
+            if event is not None:
+                event.set()
+
+    async def _worker(self) -> None:
+        while True:
+            job, path, strategy = await self._queue.get()
+            try:
+                await self._run(job, path, strategy)
+            except Exception:
+                # already recorded on the job
+                pass
+            finally:
+                path.unlink(missing_ok=True)
+                self._queue.task_done()
+
+    async def _run(
+        self, job: IngestionJob, path: Path, strategy: ChunkingStrategy
+    ) -> None:
+        await self._ingest_markdown(job, read_file(path), strategy)
+
+    async def _ingest_markdown(
+        self, job: IngestionJob, data: AsyncIterable[bytes], strategy: ChunkingStrategy
+    ) -> None:
+        async def counted() -> AsyncIterator[bytes]:
+            async for chunk in data:
+                job.bytes_read += len(chunk)
+                yield chunk
+
+        # the document is read and chunked section by section, never as a whole
+        chunks = stream_markdown_chunks(
+            counted(),
+            strategy,
+            max_section_chars=settings.ingest_stream_max_section_chars,
+        )
+        await self._ingest(job, chunks)
+
+    async def _ingest(self, job: IngestionJob, chunks: AsyncIterable[Document]) -> None:
+        job.status = "running"
+        self._notify(job)
+
+        async def with_source() -> AsyncIterator[Document]:
+            async for doc in chunks:
+                doc.metadata.setdefault("source", job.source)
+                job.chunks_total += 1
+                yield doc
+
+        def on_progress(stats: IngestionStats) -> None:
+            job.chunks_processed = stats.chunks_processed
+            job.chunks_embedded = stats.chunks_embedded
+            job.chunks_inserted = stats.chunks_inserted
+            job.chunks_unchanged = stats.chunks_unchanged
+            job.chunks_deleted = stats.chunks_deleted
+            job.failed_batches = stats.failed_batches
+            self._notify(job)
+
+        try:
+            # the upload's name identifies the document, uploading it again
+            # replaces its previous version
+            stats = await sync_document(
+                doc_id=job.source,
+                chunks=with_source(),
+                encoder=self._encoder,
+                vector_db=self._vector_db,
+                on_progress=on_progress,
+            )
+            if stats.failed_batches:
+                raise IngestionError(
+                    f"{stats.failed_batches} batches failed to be stored"
+                )
+            job.status = "completed"
+        except Exception as e:
+            print(f"[ERROR] Ingestion job {job.job_id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+            raise
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+            self._notify(job)
+
+
+ingestion_jobs = IngestionJobManager(
+    workers=settings.ingest_workers,
+    queue_size=settings.ingest_queue_size,
+    max_streams=settings.ingest_max_streams,
+)
+
+
+def get_ingestion_jobs() -> IngestionJobManager:
+    """
+    Get the ingestion job manager instance for dependency injection.
+    """
+    return ingestion_jobs
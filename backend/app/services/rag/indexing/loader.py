@@ -0,0 +1,126 @@
+import ast
+import asyncio
+import hashlib
+from itertools import islice
+from typing import AsyncIterator, Iterator
+
+import pandas as pd
+from langchain_core.documents import Document
+
+from app.services.rag.indexing.chunking import chunk_documents_parallel
+
+RECIPENLG_HANDLE = "paultimothymooney/recipenlg"
+RECIPENLG_FILE = "RecipeNLG_dataset.csv"
+RECIPENLG_COLUMNS = ["title", "ingredients", "directions", "link", "source", "NER"]
+
+DOC_MD_TEMPLATE = """
+# {food_name}
+
+## Ingredients:
+{ingredients}
+
+## Directions:
+{directions}
+"""
+
+
+def recipe_doc_id(
+    title: str, ingredients: str, directions: str, link: str, source: str, ner: str
+) -> str:
+    """
+    Stable id of a recipe across re-ingestions: its URL, or when it has none
+    its title with a hash of the whole row, since titles are not unique.
+    """
+    if link:
+        return link
+    row = "\0".join([title, ingredients, directions, source, ner])
+    return f"{title}#{hashlib.sha256(row.encode()).hexdigest()[:16]}"
+
+
+def recipe_to_document(
+    title: str, ingredients: str, directions: str, link: str, source: str, ner: str
+) -> Document:
+    """
+    Render a raw RecipeNLG row into a markdown document.
+    The ingredients and directions columns are python list literals stored as strings.
+    """
+    text_md = DOC_MD_TEMPLATE.format(
+        ingredients=ast.literal_eval(ingredients),
+        directions=ast.literal_eval(directions),
+        food_name=title,
+    )
+    return Document(
+        page_content=text_md.replace("\n", "\\n"),
+        metadata={
+            "doc_id": recipe_doc_id(title, ingredients, directions, link, source, ner),
+            "food_name": title,
+            "link": link,
+            "source": source,
+            "raw_ner": ner,
+        },
+    )
+
+
+def recipe_row_to_document(row: tuple) -> Document | None:
+    """
+    `recipe_to_document` for a raw CSV row, None when the row is malformed.
+    Runs inside the chunking process pool, so it must stay a picklable
+    module-level function.
+    """
+    try:
+        return recipe_to_document(*row)
+    except (ValueError, SyntaxError) as e:
+        print(f"[WARN] Skipping malformed recipe {row[0]!r}: {e}")
+        return None
+
+
+def read_recipe_rows(
+    csv_path: str, csv_chunksize: int = 10_000, limit: int | None = None
+) -> Iterator[tuple]:
+    """
+    Raw rows of the RecipeNLG CSV, read `csv_chunksize` rows at a time.
+    """
+    reader = pd.read_csv(
+        csv_path, usecols=RECIPENLG_COLUMNS, chunksize=csv_chunksize, dtype=str
+    )
+    rows_read = 0
+    for frame in reader:
+        if limit is not None:
+            frame = frame.head(limit - rows_read)
+        rows_read += len(frame)
+        yield from (
+            frame[RECIPENLG_COLUMNS].fillna("").itertuples(index=False, name=None)
+        )
+        if limit is not None and rows_read >= limit:
+            return
+
+
+async def stream_recipe_chunks(
+    csv_path: str,
+    csv_chunksize: int = 10_000,
+    workers: int | None = None,
+    limit: int | None = None,
+    batch_size: int = 256,
+) -> AsyncIterator[Document]:
+    """
+    Stream chunked recipe documents out of the RecipeNLG CSV.
+
+    Rows are parsed, rendered and chunked `batch_size` at a time across the
+    process pool of `chunk_documents_parallel`, which keeps only a few batches
+    per worker in flight, so memory stays flat regardless of the dataset size.
+    The blocking pipeline runs in a thread and hands its chunks over in slices.
+    """
+    chunks = chunk_documents_parallel(
+        read_recipe_rows(csv_path, csv_chunksize=csv_chunksize, limit=limit),
+        strategy="markdown",
+        workers=workers,
+        batch_size=batch_size,
+        prepare=recipe_row_to_document,
+    )
+    try:
+        while docs := await asyncio.to_thread(list, islice(chunks, 1024)):
+            for doc in docs:
+                yield doc
+    finally:
+        # shuts the process pool down when the consumer stops early
+        await asyncio.to_thread(chunks.close)
@@ -0,0 +1,241 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Literal
+
+import torch
+from langchain_core.embeddings import Embeddings
+from transformers import AutoModel, AutoTokenizer
+
+from app.core.telemetry import EMBED_BATCH_SIZE, EMBED_QUEUE_WAIT
+
+
+class TransformerEncoder:
+    """
+    Sentence-transformer style encoder running a Hugging Face model on CPU:
+    tokenize, one forward pass per `batch_size` texts, pool the last hidden
+    state and L2 normalize.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        device: str = "cpu",
+        pooling: Literal["mean", "cls"] = "mean",
+        max_length: int = 256,
+        batch_size: int = 32,
+    ):
+        self.model_name = model_name
+        self.device = torch.device(device)
+        self.pooling = pooling
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).to(self.device).eval()
+
+    @torch.inference_mode()
+    def _forward(self, texts: list[str]) -> torch.Tensor:
+        inputs = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="pt",
+        ).to(self.device)
+        hidden = self.model(**inputs).last_hidden_state
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        return torch.nn.functional.normalize(pooled, p=2, dim=1)
+
+    def encode(self, texts: list[str]) -> list[list[float]]:
+        vectors: list[list[float]] = []
+        # sorting by length keeps the padding of each forward pass small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(texts), self.batch_size):
+            batch = [texts[i] for i in order[start : start + self.batch_size]]
+            vectors.extend(self._forward(batch).tolist())
+        result: list[list[float]] = [[] for _ in texts]
+        for i, vector in zip(order, vectors):
+            result[i] = vector
+        return result
+
+
+@dataclass
+class BatchingStats:
+    requests: int = 0
+    texts: int = 0
+    batches: int = 0
+    max_batch_size: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    total_encode_seconds: float = 0.0
+
+    def as_dict(self) -> dict[str, int | float]:
+        return {
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "avg_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "avg_wait_ms": self.total_wait_seconds * 1000 / self.requests
+            if self.requests
+            else 0.0,
+            "max_wait_ms": self.max_wait_seconds * 1000,
+            "avg_encode_ms": self.total_encode_seconds * 1000 / self.batches
+            if self.batches
+            else 0.0,
+        }
+
+
+@dataclass
+class _Request:
+    texts: list[str]
+    future: asyncio.Future
+    enqueued_at: float
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Embeddings backed by a local encoder, with dynamic batching.
+
+    Async requests are queued. The first one opens a batch, requests arriving
+    within `max_wait_ms` join it until `max_batch_size` texts are collected,
+    and the whole batch is encoded in one call. Concurrent chat queries and
+    ingestion batches therefore share forward passes instead of queueing one
+    pass each. Encoding runs on a single worker thread so it never blocks the
+    event loop and passes never compete for the CPU cores; sync calls use the
+    same thread without batching.
+
+    Asymmetric models such as E5 or BGE expect an instruction in front of
+    queries (and E5 in front of passages too), given as `query_prefix` and
+    `document_prefix`.
+    """
+
+    def __init__(
+        self,
+        encoder: TransformerEncoder,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5,
+        query_prefix: str = "",
+        document_prefix: str = "",
+    ):
+        self.encoder = encoder
+        self.query_prefix = query_prefix
+        self.document_prefix = document_prefix
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000
+        self.stats = BatchingStats()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="bi-encoder"
+        )
+        self._queue: asyncio.Queue[_Request] | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+
+    def _encode(self, texts: list[str]) -> list[list[float]]:
+        started = time.perf_counter()
+        vectors = self.encoder.encode(texts)
+        with self._lock:
+            self.stats.total_encode_seconds += time.perf_counter() - started
+        return vectors
+
+    def _record_batch(self, requests: list[_Request], size: int) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            self.stats.batches += 1
+            self.stats.requests += len(requests)
+            self.stats.texts += size
+            self.stats.max_batch_size = max(self.stats.max_batch_size, size)
+            for request in requests:
+                waited = now - request.enqueued_at
+                self.stats.total_wait_seconds += waited
+                self.stats.max_wait_seconds = max(self.stats.max_wait_seconds, waited)
+                EMBED_QUEUE_WAIT.observe(waited)
+        EMBED_BATCH_SIZE.observe(size)
+
+    def _ensure_worker(self) -> asyncio.Queue[_Request]:
+        loop = asyncio.get_running_loop()
+        # the queue belongs to the loop it was created on, scripts calling
+        # asyncio.run more than once get a fresh one
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run(self._queue))
+        return self._queue
+
+    async def _collect(self, queue: asyncio.Queue[_Request]) -> list[_Request]:
+        batch = [await queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.perf_counter() + self.max_wait_seconds
+        while size < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(queue.get(), timeout)
+            except TimeoutError:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    async def _run(self, queue: asyncio.Queue[_Request]) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect(queue)
+            # callers that gave up while waiting are left out of the batch
+            batch = [request for request in batch if not request.future.done()]
+            if not batch:
+                continue
+            texts = [text for request in batch for text in request.texts]
+            self._record_batch(batch, len(texts))
+            try:
+                vectors = await loop.run_in_executor(
+                    self._executor, self._encode, texts
+                )
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+            offset = 0
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_result(
+                        vectors[offset : offset + len(request.texts)]
+                    )
+                offset += len(request.texts)
+
+    def _encode_sync(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        return self._executor.submit(self._encode, texts).result()
+
+    async def _submit(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        queue = self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await queue.put(_Request(texts, future, time.perf_counter()))
+        return await future
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._encode_sync([self.document_prefix + text for text in texts])
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._encode_sync([self.query_prefix + text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self._submit([self.document_prefix + text for text in texts])
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_queries([text]))[0]
+
+    async def aembed_queries(self, texts: list[str]) -> list[list[float]]:
+        return await self._submit([self.query_prefix + text for text in texts])
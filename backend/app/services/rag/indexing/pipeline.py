@@ -0,0 +1,404 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+from itertools import batched
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, TypeVar
+
+import tiktoken
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from pymilvus import MilvusClient
+
+from app.core.config import settings
+from app.core.telemetry import span
+from app.services.rag.indexing.store import (
+    build_rows,
+    delete_chunks,
+    insert_rows,
+    stored_chunk_ids,
+    stored_chunk_ids_by_doc,
+    tag_chunk,
+)
+
+T = TypeVar("T")
+
+
+@dataclass
+class IngestionStats:
+    """
+    Running counters of an ingestion run. Shared with the progress callback so
+    callers can observe the pipeline while it is still running.
+    """
+
+    chunks_processed: int = 0
+    chunks_embedded: int = 0
+    chunks_inserted: int = 0
+    # set by sync_document: chunks already stored as is, and stale ones removed
+    chunks_unchanged: int = 0
+    chunks_deleted: int = 0
+    tokens_embedded: int = 0
+    batches: int = 0
+    failed_batches: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float | None = None
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at or time.perf_counter()
+        return max(end - self.started_at, 1e-9)
+
+    @property
+    def chunks_per_sec(self) -> float:
+        return self.chunks_embedded / self.elapsed
+
+    @property
+    def tokens_per_sec(self) -> float:
+        return self.tokens_embedded / self.elapsed
+
+    def summary(self) -> str:
+        return (
+            f"{self.chunks_inserted}/{self.chunks_processed} chunks inserted "
+            f"in {self.batches} batches ({self.failed_batches} failed), "
+            f"{self.chunks_unchanged} unchanged, {self.chunks_deleted} deleted, "
+            f"{self.elapsed:.2f}s, {self.chunks_per_sec:.1f} chunks/sec, "
+            f"{self.tokens_per_sec:.1f} tokens/sec"
+        )
+
+
+ProgressCallback = Callable[[IngestionStats], None]
+# receives embedded rows and returns how many were stored
+RowSink = Callable[[list[dict]], int]
+
+
+@lru_cache(maxsize=1)
+def _get_tokenizer() -> tiktoken.Encoding | None:
+    try:
+        # the text-embedding-3 family uses cl100k_base
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # the encoding file is downloaded on first use, which fails offline
+        print(f"[WARN] tiktoken encoding unavailable, estimating tokens: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        return len(text) // 4 + 1
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+
+async def _aiter(docs: Iterable[Document] | AsyncIterable[Document]):
+    if isinstance(docs, AsyncIterable):
+        async for doc in docs:
+            yield doc
+    else:
+        for doc in docs:
+            yield doc
+
+
+async def _iter_batches(
+    docs: Iterable[Document] | AsyncIterable[Document],
+    batch_size: int,
+    max_tokens: int,
+    stats: IngestionStats,
+):
+    """
+    Group documents into batches bounded by both item count and token count.
+    Yields (documents, token_count) tuples.
+    """
+    batch: list[Document] = []
+    batch_tokens = 0
+    async for doc in _aiter(docs):
+        tokens = count_tokens(doc.page_content)
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > max_tokens):
+            yield batch, batch_tokens
+            batch, batch_tokens = [], 0
+        batch.append(doc)
+        batch_tokens += tokens
+        stats.chunks_processed += 1
+    if batch:
+        yield batch, batch_tokens
+
+
+async def _with_retries(
+    fn: Callable[[], Awaitable[T]], max_retries: int, label: str
+) -> T:
+    attempt = 0
+    while True:
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt >= max_retries:
+                raise
+            delay = 0.5 * 2**attempt
+            attempt += 1
+            print(
+                f"[WARN] {label} failed ({e}). Retry {attempt}/{max_retries} in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+
+
+async def _to_thread_uncancelled(fn: Callable[..., T], *args) -> T:
+    """
+    `asyncio.to_thread` that, when cancelled, waits for the thread to return
+    before raising. A thread cannot be interrupted, its write would otherwise
+    land after the caller saw the cancellation.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        raise
+
+
+async def ingest_documents(
+    docs: Iterable[Document] | AsyncIterable[Document],
+    encoder: Embeddings,
+    vector_db: MilvusClient | None = None,
+    collection_name: str | None = None,
+    batch_size: int | None = None,
+    batch_max_tokens: int | None = None,
+    max_concurrency: int | None = None,
+    max_retries: int | None = None,
+    on_progress: ProgressCallback | None = None,
+    sink: RowSink | None = None,
+    stats: IngestionStats | None = None,
+) -> IngestionStats:
+    """
+    Embed and store chunked documents into the vector database.
+
+    Documents are grouped into size-limited `embed_documents` batches, at most
+    `max_concurrency` batches are in flight at once, and every batch is inserted
+    into Milvus as soon as it is embedded. The input is consumed lazily, so a
+    generator keeps memory bounded to the in-flight batches.
+
+    A custom `sink` (called from a worker thread) can replace the Milvus insert,
+    e.g. to write bulk-import files instead. Every document needs a `doc_id` in
+    its metadata.
+    """
+    if sink is None:
+        if vector_db is None:
+            raise ValueError("Either vector_db or sink must be provided")
+        sink = partial(insert_rows, vector_db, collection_name=collection_name)
+    batch_size = batch_size or settings.ingest_batch_size
+    batch_max_tokens = batch_max_tokens or settings.ingest_batch_max_tokens
+    max_concurrency = max_concurrency or settings.ingest_max_concurrency
+    if max_retries is None:
+        max_retries = settings.ingest_max_retries
+
+    stats = stats or IngestionStats()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    in_flight: set[asyncio.Task] = set()
+
+    def report() -> None:
+        if on_progress:
+            on_progress(stats)
+
+    async def process_batch(batch_no: int, batch: list[Document], tokens: int):
+        try:
+            texts = [doc.page_content for doc in batch]
+            with span("embed.documents", chunks=len(texts)):
+                vectors = await _with_retries(
+                    lambda: encoder.aembed_documents(texts),
+                    max_retries,
+                    f"Embedding batch {batch_no}",
+                )
+            stats.chunks_embedded += len(batch)
+            stats.tokens_embedded += tokens
+            report()
+
+            rows = build_rows(batch, vectors)
+            with span("store.insert", rows=len(rows)):
+                inserted = await _with_retries(
+                    lambda: _to_thread_uncancelled(sink, rows),
+                    max_retries,
+                    f"Inserting batch {batch_no}",
+                )
+            stats.chunks_inserted += inserted
+        except Exception as e:
+            stats.failed_batches += 1
+            print(f"[ERROR] Batch {batch_no} ({len(batch)} chunks) dropped: {e}")
+        finally:
+            semaphore.release()
+            report()
+
+    try:
+        async for batch, tokens in _iter_batches(
+            docs, batch_size, batch_max_tokens, stats
+        ):
+            # waiting here applies backpressure to the document producer
+            await semaphore.acquire()
+            stats.batches += 1
+            task = asyncio.create_task(process_batch(stats.batches, batch, tokens))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+    except BaseException:
+        # the producer failed or the caller was cancelled, stop the batches
+        # still running so nothing is written after the error surfaced
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(*in_flight, return_exceptions=True)
+        raise
+
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+    stats.finished_at = time.perf_counter()
+    report()
+    print(f"[INFO] Ingestion finished: {stats.summary()}")
+    return stats
+
+
+def _is_new_chunk(
+    chunk: Document,
+    doc_id: str,
+    stored: set[str],
+    current: set[str],
+    stats: IngestionStats,
+) -> bool:
+    tag_chunk(chunk, doc_id)
+    key = chunk.metadata["chunk_id"]
+    # chunks with identical text collapse into one
+    if key in current:
+        return False
+    current.add(key)
+    if key in stored:
+        stats.chunks_unchanged += 1
+        return False
+    return True
+
+
+async def _delete_stale(
+    vector_db: MilvusClient,
+    stale: list[str],
+    collection_name: str | None,
+    stats: IngestionStats,
+) -> None:
+    with span("store.delete", rows=len(stale)):
+        for ids in batched(sorted(stale), 1000):
+            stats.chunks_deleted += await asyncio.to_thread(
+                delete_chunks, vector_db, list(ids), collection_name
+            )
+
+
+async def sync_document(
+    doc_id: str,
+    chunks: Iterable[Document] | AsyncIterable[Document],
+    encoder: Embeddings,
+    vector_db: MilvusClient,
+    collection_name: str | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> IngestionStats:
+    """
+    Make the stored chunks of one source document match `chunks`.
+
+    Only chunks whose id (document + content hash) is not stored yet are
+    embedded and written; unchanged ones are skipped. Stored chunks that are no
+    longer produced are deleted once the new ones are in, and only if every
+    batch succeeded, so a failed update never leaves the document half-empty.
+
+    `chunks` is consumed lazily, so chunks of a document that is still being
+    uploaded are embedded while the rest arrives.
+    """
+    stored = await asyncio.to_thread(
+        stored_chunk_ids, vector_db, doc_id, collection_name
+    )
+    current: set[str] = set()
+    stats = IngestionStats()
+
+    async def changed():
+        async for chunk in _aiter(chunks):
+            if _is_new_chunk(chunk, doc_id, stored, current, stats):
+                yield chunk
+
+    await ingest_documents(
+        docs=changed(),
+        encoder=encoder,
+        vector_db=vector_db,
+        collection_name=collection_name,
+        on_progress=on_progress,
+        stats=stats,
+    )
+    if not stats.failed_batches:
+        await _delete_stale(vector_db, list(stored - current), collection_name, stats)
+        if on_progress:
+            on_progress(stats)
+    print(
+        f"[INFO] Document {doc_id!r} synced: {stats.chunks_processed} chunks written, "
+        f"{stats.chunks_unchanged} unchanged, {stats.chunks_deleted} deleted"
+    )
+    return stats
+
+
+async def _group_by_doc(
+    chunks: Iterable[Document] | AsyncIterable[Document], max_docs: int
+) -> AsyncIterator[dict[str, list[Document]]]:
+    group: dict[str, list[Document]] = {}
+    async for chunk in _aiter(chunks):
+        doc_id = chunk.metadata["doc_id"]
+        if doc_id not in group and len(group) >= max_docs:
+            yield group
+            group = {}
+        group.setdefault(doc_id, []).append(chunk)
+    if group:
+        yield group
+
+
+async def sync_documents(
+    chunks: Iterable[Document] | AsyncIterable[Document],
+    encoder: Embeddings,
+    vector_db: MilvusClient,
+    collection_name: str | None = None,
+    docs_per_lookup: int = 256,
+    batch_size: int | None = None,
+    max_concurrency: int | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> IngestionStats:
+    """
+    `sync_document` for a stream of many source documents, e.g. re-loading a
+    dataset in which a few documents were edited.
+
+    Every chunk needs a `doc_id` in its metadata, and the chunks of a document
+    must arrive one after the other, as the corpus loaders produce them. The
+    stored ids of `docs_per_lookup` documents are fetched with one query, only
+    new chunks are embedded, and the stale chunks of edited documents are
+    deleted at the end if every batch succeeded.
+    """
+    stats = IngestionStats()
+    stale: list[str] = []
+
+    async def changed():
+        async for group in _group_by_doc(chunks, docs_per_lookup):
+            stored = await asyncio.to_thread(
+                stored_chunk_ids_by_doc, vector_db, list(group), collection_name
+            )
+            for doc_id, doc_chunks in group.items():
+                known = stored.get(doc_id, set())
+                current: set[str] = set()
+                for chunk in doc_chunks:
+                    if _is_new_chunk(chunk, doc_id, known, current, stats):
+                        yield chunk
+                stale.extend(known - current)
+
+    await ingest_documents(
+        docs=changed(),
+        encoder=encoder,
+        vector_db=vector_db,
+        collection_name=collection_name,
+        batch_size=batch_size,
+        max_concurrency=max_concurrency,
+        on_progress=on_progress,
+        stats=stats,
+    )
+    if not stats.failed_batches:
+        await _delete_stale(vector_db, stale, collection_name, stats)
+        if on_progress:
+            on_progress(stats)
+    print(
+        f"[INFO] Corpus synced: {stats.chunks_processed} chunks written, "
+        f"{stats.chunks_unchanged} unchanged, {stats.chunks_deleted} deleted"
+    )
+    return stats
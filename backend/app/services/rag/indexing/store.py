@@ -0,0 +1,206 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Callable
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from langchain_core.documents import Document
+from pymilvus import MilvusClient
+
+from app.core.config import settings
+
+
+def chunk_id(doc_id: str, text: str) -> str:
+    """
+    Primary key of a chunk: the hash of its source document and its content.
+    Re-ingesting unchanged text yields the same id, so it is never duplicated.
+    """
+    return hashlib.sha256(f"{doc_id}\0{text}".encode()).hexdigest()[:32]
+
+
+def tag_chunk(doc: Document, doc_id: str) -> Document:
+    """
+    Attach the source document id and the chunk id to a chunk's metadata.
+    """
+    doc.metadata["doc_id"] = doc_id
+    doc.metadata["chunk_id"] = chunk_id(doc_id, doc.page_content)
+    return doc
+
+
+def build_rows(docs: list[Document], vectors: list[list[float]]) -> list[dict]:
+    """
+    Pair chunked documents with their embeddings into Milvus rows.
+    Every document needs a `doc_id` in its metadata. The remaining metadata is
+    stored through the collection's dynamic fields.
+    """
+    rows = []
+    for doc, vector in zip(docs, vectors, strict=True):
+        metadata = dict(doc.metadata)
+        doc_id = metadata.pop("doc_id")
+        row_id = metadata.pop("chunk_id", None) or chunk_id(doc_id, doc.page_content)
+        rows.append(
+            {
+                "id": row_id,
+                "doc_id": doc_id,
+                "text": doc.page_content,
+                "vector": vector,
+                **metadata,
+            }
+        )
+    return rows
+
+
+CollectionListener = Callable[[str], None]
+_collection_listeners: list[CollectionListener] = []
+
+
+def add_collection_listener(listener: CollectionListener) -> None:
+    """
+    Register a callback that is called with the collection name every time rows
+    are written to it, e.g. to invalidate caches built on top of the collection.
+    """
+    _collection_listeners.append(listener)
+
+
+def notify_collection_changed(collection_name: str) -> None:
+    for listener in _collection_listeners:
+        listener(collection_name)
+
+
+def insert_rows(
+    vector_db: MilvusClient, rows: list[dict], collection_name: str | None = None
+) -> int:
+    """
+    Upsert rows into the collection and return the number of written rows.
+    Rows whose chunk id already exists replace the stored one.
+    """
+    collection_name = collection_name or settings.collection_name
+    res = vector_db.upsert(collection_name=collection_name, data=rows)
+    notify_collection_changed(collection_name)
+    return res["upsert_count"]
+
+
+def stored_chunk_ids(
+    vector_db: MilvusClient, doc_id: str, collection_name: str | None = None
+) -> set[str]:
+    """
+    Ids of the chunks currently stored for a source document.
+    """
+    return stored_chunk_ids_by_doc(vector_db, [doc_id], collection_name).get(
+        doc_id, set()
+    )
+
+
+def string_list_literal(values: list[str]) -> str:
+    """
+    Milvus filter literal for a list of strings. Only backslashes and double
+    quotes are escaped, non-ASCII characters are kept as they are since the
+    filter parser rejects unicode escapes and Milvus Lite has no templated
+    filters.
+    """
+    quoted = (
+        '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"' for value in values
+    )
+    return "[" + ", ".join(quoted) + "]"
+
+
+def stored_chunk_ids_by_doc(
+    vector_db: MilvusClient, doc_ids: list[str], collection_name: str | None = None
+) -> dict[str, set[str]]:
+    """
+    Ids of the chunks currently stored for several source documents, fetched
+    with a single query. Documents without stored chunks are left out.
+    """
+    iterator = vector_db.query_iterator(
+        collection_name=collection_name or settings.collection_name,
+        batch_size=1000,
+        filter=f"doc_id in {string_list_literal(doc_ids)}",
+        output_fields=["id", "doc_id"],
+    )
+    ids: dict[str, set[str]] = {}
+    try:
+        while batch := iterator.next():
+            for row in batch:
+                ids.setdefault(row["doc_id"], set()).add(row["id"])
+    finally:
+        iterator.close()
+    return ids
+
+
+def delete_chunks(
+    vector_db: MilvusClient, ids: list[str], collection_name: str | None = None
+) -> int:
+    if not ids:
+        return 0
+    collection_name = collection_name or settings.collection_name
+    res = vector_db.delete(collection_name=collection_name, ids=ids)
+    notify_collection_changed(collection_name)
+    # some servers return the deleted primary keys instead of a count
+    return len(res) if isinstance(res, list) else res.get("delete_count", 0)
+
+
+class ParquetSink:
+    """
+    Write embedded rows into Parquet files laid out for Milvus bulk import.
+    Fields outside of the collection schema are packed into the `$meta` column
+    as JSON, which is how Milvus expects dynamic fields in import files.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        rows_per_file: int = 100_000,
+        schema_fields: tuple[str, ...] = ("id", "doc_id", "text", "vector"),
+    ):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.rows_per_file = rows_per_file
+        self.schema_fields = schema_fields
+        self.files: list[str] = []
+        self._writer: pq.ParquetWriter | None = None
+        self._rows_in_file = 0
+        self._lock = threading.Lock()
+
+    def _to_table(self, rows: list[dict]) -> pa.Table:
+        columns = {name: [row[name] for row in rows] for name in self.schema_fields}
+        columns["$meta"] = [
+            json.dumps({k: v for k, v in row.items() if k not in self.schema_fields})
+            for row in rows
+        ]
+        table = pa.table(columns)
+        # Milvus expects FLOAT_VECTOR fields as list<float32>
+        vector_idx = table.schema.get_field_index("vector")
+        if vector_idx != -1:
+            table = table.set_column(
+                vector_idx,
+                "vector",
+                table.column("vector").cast(pa.list_(pa.float32())),
+            )
+        return table
+
+    def _open_next_file(self, schema: pa.Schema) -> None:
+        path = self.output_dir / f"part-{len(self.files):05d}.parquet"
+        self._writer = pq.ParquetWriter(path, schema)
+        self._rows_in_file = 0
+        self.files.append(str(path))
+
+    def __call__(self, rows: list[dict]) -> int:
+        table = self._to_table(rows)
+        with self._lock:
+            if self._writer is None:
+                self._open_next_file(table.schema)
+            self._writer.write_table(table)
+            self._rows_in_file += len(rows)
+            if self._rows_in_file >= self.rows_per_file:
+                self._writer.close()
+                self._writer = None
+        return len(rows)
+
+    def close(self) -> list[str]:
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        return self.files
@@ -0,0 +1,159 @@
+import asyncio
+import codecs
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator
+
+from fastapi import UploadFile
+from langchain_core.documents import Document
+
+from app.services.rag.indexing.chunking import ChunkingStrategy
+
+_HEADER = re.compile(r"^(#{1,6})[ \t]+\S")
+_FENCE = re.compile(r"^[ \t]{0,3}(```|~~~)")
+
+
+async def read_upload(
+    file: UploadFile, chunk_size: int = 64 * 1024
+) -> AsyncIterator[bytes]:
+    while chunk := await file.read(chunk_size):
+        yield chunk
+
+
+async def read_file(path: Path, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, chunk_size):
+            yield chunk
+
+
+async def save_upload(file: UploadFile, chunk_size: int = 1024 * 1024) -> Path:
+    """
+    Copy an upload to a temporary file chunk by chunk, for jobs that read it
+    after the request has ended. The caller deletes the file.
+    """
+    fd, name = tempfile.mkstemp(prefix="upload-", suffix=".md")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async for chunk in read_upload(file, chunk_size):
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        # a partial copy is never handed to a job, nobody else would delete it
+        Path(name).unlink(missing_ok=True)
+        raise
+    return Path(name)
+
+
+async def decode_stream(
+    chunks: AsyncIterable[bytes], encoding: str = "utf-8"
+) -> AsyncIterator[str]:
+    """
+    Decode a byte stream piece by piece. Multi-byte characters split across
+    chunks are carried over to the next one.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    async for chunk in chunks:
+        if text := decoder.decode(chunk):
+            yield text
+    if tail := decoder.decode(b"", final=True):
+        yield tail
+
+
+async def _lines(texts: AsyncIterable[str], max_line: int) -> AsyncIterator[str]:
+    # a single line longer than `max_line` is passed on in pieces
+    pending = ""
+    async for text in texts:
+        pending += text
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+        while len(pending) > max_line:
+            yield pending[:max_line]
+            pending = pending[max_line:]
+    if pending:
+        yield pending
+
+
+async def markdown_sections(
+    texts: AsyncIterable[str], max_chars: int = 64_000, max_level: int = 3
+) -> AsyncIterator[str]:
+    """
+    Cut streamed markdown at header boundaries as it arrives.
+
+    Every section is yielded once the next header of level `max_level` or
+    higher shows up, prefixed with the headers it sits under, so a header
+    aligned strategy gives the same chunks and header metadata for the sections
+    one by one as for the whole document. Other strategies would see the
+    repeated headers and the section cuts. Headers inside fenced code blocks
+    are ignored, and a section growing past `max_chars` is cut at a line
+    boundary, so memory stays bounded however large the document is.
+    """
+    headers: dict[int, str] = {}
+    body: list[str] = []
+    size = 0
+    in_fence = False
+
+    def section() -> str | None:
+        if not any(line.strip() for line in body):
+            return None
+        return "".join(headers[level] for level in sorted(headers)) + "".join(body)
+
+    async for line in _lines(texts, max_chars):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADER.match(line)
+        if match and len(match.group(1)) <= max_level:
+            if text := section():
+                yield text
+            level = len(match.group(1))
+            headers = {k: v for k, v in headers.items() if k < level}
+            headers[level] = line if line.endswith("\n") else line + "\n"
+            body, size = [], 0
+            continue
+        body.append(line)
+        size += len(line)
+        if size >= max_chars:
+            if text := section():
+                yield text
+            body, size = [], 0
+    if text := section():
+        yield text
+
+
+async def chunk_sections(
+    sections: AsyncIterable[str],
+    strategy: ChunkingStrategy,
+    metadata: dict | None = None,
+) -> AsyncIterator[Document]:
+    """
+    Chunk every section as soon as it is complete, off the event loop.
+    """
+    async for text in sections:
+        for chunk in await asyncio.to_thread(strategy.split_text, text):
+            chunk.metadata = {**(metadata or {}), **chunk.metadata}
+            yield chunk
+
+
+def check_streaming_strategy(strategy: ChunkingStrategy) -> None:
+    if not strategy.header_aligned:
+        raise ValueError(
+            f"Chunking strategy {strategy.name!r} does not split at markdown "
+            "headers, so it cannot chunk a document section by section"
+        )
+
+
+async def stream_markdown_chunks(
+    chunks: AsyncIterable[bytes],
+    strategy: ChunkingStrategy,
+    metadata: dict | None = None,
+    max_section_chars: int = 64_000,
+) -> AsyncIterator[Document]:
+    """
+    Raw markdown bytes in, chunked documents out, one section at a time.
+    Only header aligned strategies are accepted, see `markdown_sections`.
+    """
+    check_streaming_strategy(strategy)
+    sections = markdown_sections(decode_stream(chunks), max_chars=max_section_chars)
+    async for chunk in chunk_sections(sections, strategy, metadata):
+        yield chunk
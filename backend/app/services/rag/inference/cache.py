@@ -0,0 +1,185 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.rag.indexing.store import add_collection_listener
+
+SearchKey = tuple[str, tuple]
+
+
+@dataclass
+class RetrievalCacheStats:
+    exact_hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    def as_dict(self) -> dict[str, int | float]:
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+
+
+@dataclass
+class _Entry:
+    hits: list[dict]
+    expires_at: float
+    # normalized query embedding, only kept when the semantic tier is enabled
+    vector: np.ndarray | None = None
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class RetrievalCache:
+    """
+    Result cache in front of the vector search.
+
+    The exact tier is keyed by the normalized query and search parameters. The
+    optional semantic tier reuses the hits of a cached query whose embedding is
+    within `semantic_threshold` cosine similarity of the new one. Entries expire
+    after `ttl_seconds`, the least recently used ones are evicted past
+    `max_entries`, and everything is dropped when the collection changes.
+
+    Invalidation is per process; the TTL bounds staleness across workers.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 300,
+        semantic_threshold: float | None = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+        self.stats = RetrievalCacheStats()
+        self._entries: OrderedDict[SearchKey, _Entry] = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.semantic_threshold is not None
+
+    @property
+    def generation(self) -> int:
+        """
+        Changes on every invalidation. Capture it before searching and pass it
+        to `put` so results computed against an outdated collection are dropped.
+        """
+        return self._generation
+
+    @staticmethod
+    def key(query: str, params: tuple) -> SearchKey:
+        return normalize_query(query), params
+
+    def get(self, key: SearchKey) -> list[dict] | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at < now:
+                return None
+            self._entries.move_to_end(key)
+            self.stats.exact_hits += 1
+            return entry.hits
+
+    def get_similar(self, vector: list[float], params: tuple) -> list[dict] | None:
+        if not self.semantic_enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                (key, entry)
+                for key, entry in self._entries.items()
+                if key[1] == params
+                and entry.vector is not None
+                and entry.expires_at >= now
+            ]
+            if not candidates:
+                return None
+            matrix = np.stack([entry.vector for _, entry in candidates])
+            scores = matrix @ _normalize(vector)
+            best = int(np.argmax(scores))
+            if scores[best] < self.semantic_threshold:
+                return None
+            key, entry = candidates[best]
+            self._entries.move_to_end(key)
+            self.stats.semantic_hits += 1
+            return entry.hits
+
+    def miss(self, count: int = 1) -> None:
+        with self._lock:
+            self.stats.misses += count
+
+    def put(
+        self,
+        key: SearchKey,
+        hits: list[dict],
+        generation: int,
+        vector: list[float] | None = None,
+    ) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = _Entry(
+                hits=hits,
+                expires_at=time.monotonic() + self.ttl_seconds,
+                vector=_normalize(vector)
+                if self.semantic_enabled and vector is not None
+                else None,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self.stats.invalidations += 1
+
+
+def _normalize(vector: list[float]) -> np.ndarray:
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(arr)
+    return arr / norm if norm else arr
+
+
+retrieval_cache = RetrievalCache(
+    max_entries=settings.retrieval_cache_max_entries,
+    ttl_seconds=settings.retrieval_cache_ttl_seconds,
+    semantic_threshold=settings.retrieval_cache_semantic_threshold,
+)
+
+
+def _on_collection_changed(collection_name: str) -> None:
+    if collection_name == settings.collection_name:
+        retrieval_cache.invalidate()
+
+
+add_collection_listener(_on_collection_changed)
+
+
+def get_retrieval_cache() -> RetrievalCache | None:
+    """
+    Get the retrieval cache instance for dependency injection.
+    """
+    if not settings.retrieval_cache_enabled:
+        return None
+    return retrieval_cache
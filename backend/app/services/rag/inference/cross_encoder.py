@@ -0,0 +1,36 @@
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+
+class CrossEncoderScorer:
+    """
+    Scores (query, passage) pairs with a Hugging Face cross-encoder on CPU,
+    e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2" or "BAAI/bge-reranker-base".
+    Higher is more relevant.
+    """
+
+    def __init__(self, model_name: str, device: str = "cpu", max_length: int = 512):
+        self.model_name = model_name
+        self.device = torch.device(device)
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = (
+            AutoModelForSequenceClassification.from_pretrained(model_name)
+            .to(self.device)
+            .eval()
+        )
+
+    @torch.inference_mode()
+    def __call__(self, query: str, passages: list[str]) -> list[float]:
+        inputs = self.tokenizer(
+            [query] * len(passages),
+            passages,
+            padding=True,
+            truncation="only_second",
+            max_length=self.max_length,
+            return_tensors="pt",
+        ).to(self.device)
+        logits = self.model(**inputs).logits
+        # single-logit models output the relevance directly, two-class models
+        # put it in the last column
+        return logits[:, -1].float().tolist()
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable
+
+from app.core.config import settings
+from app.core.telemetry import RERANKS, span
+
+# (query, passages) -> one relevance score per passage
+Scorer = Callable[[str, list[str]], list[float]]
+
+
+@dataclass
+class RerankStats:
+    requests: int = 0
+    # every candidate was scored
+    complete: int = 0
+    # the budget ran out after some batches, the rest kept their ANN order
+    partial: int = 0
+    # nothing was scored in time, the ANN order was returned as is
+    fallbacks: int = 0
+    candidates_scored: int = 0
+    total_seconds: float = 0.0
+
+    def as_dict(self) -> dict[str, int | float]:
+        return {
+            "requests": self.requests,
+            "complete": self.complete,
+            "partial": self.partial,
+            "fallbacks": self.fallbacks,
+            "candidates_scored": self.candidates_scored,
+            "avg_ms": self.total_seconds * 1000 / self.requests
+            if self.requests
+            else 0.0,
+        }
+
+
+def _passage(hit: dict) -> str:
+    return hit.get("entity", {}).get("text", "")
+
+
+class Reranker:
+    """
+    Second stage after the vector search: the over-fetched ANN candidates are
+    scored against the query with a cross-encoder and the best `top_k` kept.
+
+    Candidates are scored in ANN order, `batch_size` at a time, until the
+    request's latency budget is spent. Scored candidates are sorted by their
+    score and placed ahead of the unscored ones, which keep their ANN order, so
+    running out of budget degrades to plain ANN results instead of delaying the
+    answer. A batch that is still running when the budget expires finishes in
+    the background and its scores are dropped.
+    """
+
+    def __init__(self, scorer: Scorer, batch_size: int = 16, budget_ms: float = 200):
+        self.scorer = scorer
+        self.batch_size = batch_size
+        self.budget_seconds = budget_ms / 1000
+        self.stats = RerankStats()
+        # one scoring thread, concurrent requests take turns instead of
+        # oversubscribing the cores
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self._lock = threading.Lock()
+
+    async def rerank(
+        self, query: str, hits: list[dict], top_k: int, budget_ms: float | None = None
+    ) -> list[dict]:
+        budget = budget_ms / 1000 if budget_ms is not None else self.budget_seconds
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        scores: list[float] = []
+        with span("rerank", candidates=len(hits)):
+            for start in range(0, len(hits), self.batch_size):
+                remaining = budget - (time.perf_counter() - started)
+                if remaining <= 0:
+                    break
+                passages = [
+                    _passage(hit) for hit in hits[start : start + self.batch_size]
+                ]
+                try:
+                    scores.extend(
+                        await asyncio.wait_for(
+                            loop.run_in_executor(
+                                self._executor, self.scorer, query, passages
+                            ),
+                            remaining,
+                        )
+                    )
+                except TimeoutError:
+                    break
+
+        scored = sorted(
+            (
+                {**hit, "rerank_score": score}
+                for hit, score in zip(hits, scores, strict=False)
+            ),
+            key=lambda hit: hit["rerank_score"],
+            reverse=True,
+        )
+        if len(scores) == len(hits):
+            outcome = "complete"
+        elif scores:
+            outcome = "partial"
+        else:
+            outcome = "fallback"
+        self._record(outcome, len(scores), time.perf_counter() - started)
+        return (scored + hits[len(scores) :])[:top_k]
+
+    def _record(self, outcome: str, scored: int, seconds: float) -> None:
+        RERANKS.labels(outcome=outcome).inc()
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.candidates_scored += scored
+            self.stats.total_seconds += seconds
+            if outcome == "complete":
+                self.stats.complete += 1
+            elif outcome == "partial":
+                self.stats.partial += 1
+            else:
+                self.stats.fallbacks += 1
+
+    def as_dict(self) -> dict[str, int | float]:
+        return self.stats.as_dict()
+
+
+@lru_cache(maxsize=1)
+def _reranker() -> Reranker:
+    # torch and transformers are only loaded when a reranking model is configured
+    from app.services.rag.inference.cross_encoder import CrossEncoderScorer
+
+    scorer = CrossEncoderScorer(
+        model_name=settings.reranking_model,
+        device=settings.rerank_device,
+        max_length=settings.rerank_max_length,
+    )
+    return Reranker(
+        scorer=scorer,
+        batch_size=settings.rerank_batch_size,
+        budget_ms=settings.rerank_budget_ms,
+    )
+
+
+def get_reranker() -> Reranker | None:
+    """
+    Process-wide reranker for dependency injection, None when no
+    `reranking_model` is configured.
+    """
+    if not settings.reranking_model:
+        return None
+    return _reranker()
@@ -1,22 +1,170 @@
-from langchain_openai.embeddings import OpenAIEmbeddings
-from pymilvus import MilvusClient
+import asyncio
+
+from langchain_core.embeddings import Embeddings
+from pymilvus import AsyncMilvusClient, MilvusClient
 from app.core.config import settings
+from app.core.telemetry import span
+from app.services.rag.inference.cache import RetrievalCache
+from app.services.rag.inference.reranker import Reranker
+from app.services.rag.indexing.embedding_cache import aembed_queries
+from client.milvus_client import build_search_params
+
+
+def _search_kwargs(
+    query_vectors: list[list[float]],
+    top_k: int | None = None,
+    ef: int | None = None,
+    nprobe: int | None = None,
+) -> dict:
+    top_k = top_k or settings.search_top_k
+    return {
+        "collection_name": settings.collection_name,
+        "anns_field": "vector",
+        "output_fields": ["text", "dynamic_fields"],
+        "limit": top_k,
+        "search_params": build_search_params(top_k=top_k, ef=ef, nprobe=nprobe),
+        "data": query_vectors,
+    }
+
+
+def _to_dicts(res) -> list[list[dict]]:
+    # Milvus hits are not JSON serializable as is
+    return [[dict(hit) for hit in hits] for hits in res]
 
 
 def retrieve_relevant_chunks(
-    query: str, encoder: OpenAIEmbeddings, vector_db: MilvusClient
+    query: str,
+    encoder: Embeddings,
+    vector_db: MilvusClient,
+    top_k: int | None = None,
+    ef: int | None = None,
+    nprobe: int | None = None,
 ) -> list[list[dict]]:
-    query_vector = encoder.embed_query(query)
-    res = vector_db.search(
-        collection_name=settings.collection_name,
-        anns_field="vector",
-        output_fields=["text", "dynamic_fields"],
-        limit=5,
-        data=[query_vector],
-    )
+    with span("retrieve"):
+        with span("embed.query"):
+            query_vector = encoder.embed_query(query)
+        with span("milvus.search"):
+            res = vector_db.search(**_search_kwargs([query_vector], top_k, ef, nprobe))
     # res = res[0]
     # res = [
     #     {"content": hit.entity.text, "metadata": hit.entity.dynamic_fields}
     #     for hit in res
     # ]
-    return res
+    return _to_dicts(res)
+
+
+async def _aembed_queries(encoder: Embeddings, queries: list[str]) -> list[list[float]]:
+    with span("embed.query", queries=len(queries)):
+        if len(queries) == 1:
+            return [await encoder.aembed_query(queries[0])]
+        return await aembed_queries(encoder, queries)
+
+
+async def _asearch(vector_db: AsyncMilvusClient, **kwargs) -> list[list[dict]]:
+    with span("milvus.search", queries=len(kwargs["data"])):
+        return _to_dicts(await vector_db.search(**kwargs))
+
+
+async def aretrieve_relevant_chunks(
+    query: str,
+    encoder: Embeddings,
+    vector_db: AsyncMilvusClient,
+    top_k: int | None = None,
+    ef: int | None = None,
+    nprobe: int | None = None,
+    cache: RetrievalCache | None = None,
+    reranker: Reranker | None = None,
+) -> list[list[dict]]:
+    """
+    Non-blocking version of `retrieve_relevant_chunks` for request handlers.
+    """
+    return await aretrieve_relevant_chunks_batch(
+        queries=[query],
+        encoder=encoder,
+        vector_db=vector_db,
+        top_k=top_k,
+        ef=ef,
+        nprobe=nprobe,
+        cache=cache,
+        reranker=reranker,
+    )
+
+
+async def aretrieve_relevant_chunks_batch(
+    queries: list[str],
+    encoder: Embeddings,
+    vector_db: AsyncMilvusClient,
+    top_k: int | None = None,
+    ef: int | None = None,
+    nprobe: int | None = None,
+    cache: RetrievalCache | None = None,
+    reranker: Reranker | None = None,
+) -> list[list[dict]]:
+    """
+    Embed all queries in one call and send them as a single multi-vector search.
+    Results are returned in the same order as the queries.
+
+    With a cache, exact hits skip both the embedding and the search, semantic
+    hits skip the search, and only the remaining queries reach Milvus.
+
+    With a reranker, `rerank_candidates` hits are fetched per query and the
+    reranker picks the `top_k` returned.
+    """
+    top_k = top_k or settings.search_top_k
+    fetch_k = max(settings.rerank_candidates, top_k) if reranker else top_k
+    with span("retrieve", queries=len(queries)):
+        if cache is None:
+            query_vectors = await _aembed_queries(encoder, queries)
+            results = await _asearch(
+                vector_db, **_search_kwargs(query_vectors, fetch_k, ef, nprobe)
+            )
+        else:
+            results = await _aretrieve_cached(
+                queries, encoder, vector_db, fetch_k, ef, nprobe, cache
+            )
+        if reranker is None:
+            return results
+        return list(
+            await asyncio.gather(
+                *(
+                    reranker.rerank(query, hits, top_k)
+                    for query, hits in zip(queries, results)
+                )
+            )
+        )
+
+
+async def _aretrieve_cached(
+    queries: list[str],
+    encoder: Embeddings,
+    vector_db: AsyncMilvusClient,
+    top_k: int | None,
+    ef: int | None,
+    nprobe: int | None,
+    cache: RetrievalCache,
+) -> list[list[dict]]:
+
+    params = (top_k or settings.search_top_k, ef, nprobe)
+    generation = cache.generation
+    keys = [cache.key(query, params) for query in queries]
+    results: list[list[dict] | None] = [cache.get(key) for key in keys]
+
+    pending = [i for i, hits in enumerate(results) if hits is None]
+    if pending:
+        vectors = await _aembed_queries(encoder, [queries[i] for i in pending])
+        to_search = []
+        for i, vector in zip(pending, vectors):
+            results[i] = cache.get_similar(vector, params)
+            if results[i] is None:
+                to_search.append((i, vector))
+
+        if to_search:
+            cache.miss(len(to_search))
+            res = await _asearch(
+                vector_db,
+                **_search_kwargs([v for _, v in to_search], top_k, ef, nprobe),
+            )
+            for (i, vector), hits in zip(to_search, res):
+                results[i] = hits
+                cache.put(keys[i], hits, generation=generation, vector=vector)
+    return results
@@ -1,63 +1,222 @@
-from pymilvus import DataType, MilvusClient
-from pymilvus import IndexType
+import json
+import time
+
+from pymilvus import AsyncMilvusClient, CollectionSchema, DataType, MilvusClient
+from pymilvus.milvus_client import IndexParams
 from app.core.config import settings
 
-client = MilvusClient(settings.milvus_uri)
+# bump whenever the collection fields change
+SCHEMA_VERSION = 2
+SCHEMA_PROPERTY = "chat_man.schema"
+INDEX_PROPERTY = "chat_man.index"
+VECTOR_INDEX_NAME = "vector_idx"
+
+# created on first use, so importing the app does not connect to Milvus
+client: MilvusClient | None = None
+# created lazily since the async client binds to the running event loop
+async_client: AsyncMilvusClient | None = None
 
 
 def get_milvus_client() -> MilvusClient:
     """
     Get the Milvus client instance for dependency injection.
     """
-    print("[DEBUG] Connecting with Milvus client")
-    # TODO: Check if this implementation is already okay
+    global client
+    if client is None:
+        print("[DEBUG] Connecting with Milvus client")
+        client = MilvusClient(settings.milvus_uri)
     return client
 
 
-def initial_setup(client: MilvusClient):
+async def get_async_milvus_client() -> AsyncMilvusClient:
     """
-    Initialize database and collection in vector database (Milvus) upon startup
+    Get the async Milvus client instance for dependency injection.
+    Used on request paths so that searches do not block the event loop.
     """
-    if settings.milvus_db_name not in client.list_databases():
-        client.create_database(db_name=settings.milvus_db_name)
+    global async_client
+    if async_client is None:
+        async_client = AsyncMilvusClient(
+            settings.milvus_uri, db_name=settings.milvus_db_name
+        )
+    return async_client
 
-    client.use_database(db_name=settings.milvus_db_name)
 
-    client.drop_collection(collection_name=settings.collection_name)
+async def close_async_milvus_client() -> None:
+    global async_client
+    if async_client is not None:
+        await async_client.close()
+        async_client = None
 
-    if client.has_collection(settings.collection_name):
-        print("[INFO] Collection already exists. Skipping initial setup.")
-        return None
 
-    print("[INFO] Defining Schema for collection...")
+def index_definition() -> dict:
+    """
+    Vector index definition based on the configured index type and build parameters.
+    """
+    index_type = settings.vector_index_type
+    if index_type == "HNSW":
+        params = {"M": settings.hnsw_m, "efConstruction": settings.hnsw_ef_construction}
+    elif index_type in ("IVF_FLAT", "IVF_SQ8"):
+        params = {"nlist": settings.ivf_nlist}
+    elif index_type == "IVF_PQ":
+        params = {
+            "nlist": settings.ivf_nlist,
+            "m": settings.ivf_pq_m,
+            "nbits": settings.ivf_pq_nbits,
+        }
+    else:
+        params = {}
+    return {
+        "index_type": index_type,
+        "metric_type": settings.vector_metric_type,
+        "params": params,
+    }
+
+
+def build_index_params(client: MilvusClient) -> IndexParams:
+    index = client.prepare_index_params()
+    index.add_index(
+        field_name="vector", index_name=VECTOR_INDEX_NAME, **index_definition()
+    )
+    return index
+
+
+def build_search_params(
+    top_k: int, ef: int | None = None, nprobe: int | None = None
+) -> dict:
+    """
+    Search parameters matching the configured index type. `ef` applies to HNSW
+    (and is the search list size for DISKANN), `nprobe` to the IVF family.
+    """
+    index_type = settings.vector_index_type
+    if index_type == "HNSW":
+        # HNSW requires ef >= limit
+        params = {"ef": max(ef or settings.hnsw_ef, top_k)}
+    elif index_type == "DISKANN":
+        params = {"search_list": max(ef or settings.diskann_search_list, top_k)}
+    else:
+        params = {"nprobe": nprobe or settings.ivf_nprobe}
+    return {"metric_type": settings.vector_metric_type, "params": params}
+
 
-    # we would just make use of the index from the dataset as the id so that we can upsert easily
+def schema_definition() -> str:
+    """
+    Fingerprint of the collection structure. Bump SCHEMA_VERSION whenever the
+    fields below change so existing deployments rebuild the collection.
+    """
+    return f"v{SCHEMA_VERSION}:dim={settings.encoder_dim}"
+
+
+def build_schema(client: MilvusClient) -> CollectionSchema:
+    # chunk ids are content hashes (see store.chunk_id) so re-ingesting a document
+    # only writes the chunks that changed
     schema = client.create_schema(enable_dynamic_field=True)
     schema.add_field(
-        field_name="id", datatype=DataType.INT64, is_primary=True, auto_id=True
+        field_name="id",
+        datatype=DataType.VARCHAR,
+        max_length=64,
+        is_primary=True,
+        auto_id=False,
+    )
+    # identity of the source document, used to find and delete its chunks
+    schema.add_field(field_name="doc_id", datatype=DataType.VARCHAR, max_length=1024)
+    schema.add_field(
+        field_name="vector", datatype=DataType.FLOAT_VECTOR, dim=settings.encoder_dim
     )
-    schema.add_field(field_name="vector", datatype=DataType.FLOAT_VECTOR, dim=1536)
     schema.add_field(field_name="text", datatype=DataType.VARCHAR, max_length=2000)
     # TODO: Add sparse vector field
 
     # TODO: Add built-in function using BM25
     # print("[INFO] Creating built-in functions")
     # schema.add_function()
+    return schema
+
+
+def _create_collection(client: MilvusClient) -> None:
+    print("[INFO] Defining Schema for collection...")
+    schema = build_schema(client)
 
     print("[INFO] Defining and applying indexing parameters")
-    index = client.prepare_index_params()
-    index.add_index(
-        field_name="vector",
-        index_type=IndexType.HNSW,
-        index_name="vector_idx",
-        metric_type="COSINE",
-    )
+    index = build_index_params(client)
+    index.add_index(field_name="doc_id", index_type="INVERTED")
 
     print("[INFO] Creating Collection")
     client.create_collection(
-        collection_name=settings.collection_name, schema=schema, index_params=index
+        collection_name=settings.collection_name,
+        schema=schema,
+        index_params=index,
+        properties={
+            SCHEMA_PROPERTY: schema_definition(),
+            INDEX_PROPERTY: json.dumps(index_definition(), sort_keys=True),
+        },
     )
 
+
+def _rebuild_index(client: MilvusClient) -> None:
+    client.release_collection(collection_name=settings.collection_name)
+    client.drop_index(
+        collection_name=settings.collection_name, index_name=VECTOR_INDEX_NAME
+    )
+    client.create_index(
+        collection_name=settings.collection_name,
+        index_params=build_index_params(client),
+    )
+    client.alter_collection_properties(
+        collection_name=settings.collection_name,
+        properties={INDEX_PROPERTY: json.dumps(index_definition(), sort_keys=True)},
+    )
+
+
+def initial_setup(client: MilvusClient) -> float:
+    """
+    Initialize database and collection in vector database (Milvus) upon startup.
+
+    An existing collection is reused as long as its stored schema and index
+    definitions match the current ones. A schema change rebuilds the collection,
+    an index change only rebuilds the vector index. Returns the setup time in seconds.
+    """
+    started = time.perf_counter()
+    if settings.milvus_db_name not in client.list_databases():
+        client.create_database(db_name=settings.milvus_db_name)
+
+    client.use_database(db_name=settings.milvus_db_name)
+
+    if settings.milvus_recreate_collection:
+        print("[INFO] Recreating collection as requested by settings")
+        client.drop_collection(collection_name=settings.collection_name)
+
+    if not client.has_collection(settings.collection_name):
+        _create_collection(client)
+        action = "created"
+    else:
+        properties = client.describe_collection(settings.collection_name).get(
+            "properties", {}
+        )
+        stored_schema = properties.get(SCHEMA_PROPERTY)
+        stored_index = properties.get(INDEX_PROPERTY)
+        if stored_schema != schema_definition():
+            print(
+                f"[INFO] Schema changed ({stored_schema} -> {schema_definition()}). "
+                "Rebuilding collection, existing vectors have to be re-ingested."
+            )
+            client.drop_collection(collection_name=settings.collection_name)
+            _create_collection(client)
+            action = "rebuilt"
+        elif stored_index != json.dumps(index_definition(), sort_keys=True):
+            print(
+                f"[INFO] Index definition changed ({stored_index}). Rebuilding vector index."
+            )
+            _rebuild_index(client)
+            action = "reindexed"
+        else:
+            print("[INFO] Collection already exists and is up to date. Reusing it.")
+            action = "reused"
+
+    load_started = time.perf_counter()
     client.load_collection(collection_name=settings.collection_name)
     res = client.get_load_state(collection_name=settings.collection_name)
-    print(f"[INFO] Successfully created and loaded collection. \nStatus: {res}")
+    finished = time.perf_counter()
+    print(
+        f"[INFO] Collection {action} and loaded in {finished - load_started:.2f}s "
+        f"(setup total {finished - started:.2f}s). \nStatus: {res}"
+    )
+    return finished - started
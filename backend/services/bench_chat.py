@@ -0,0 +1,353 @@
+"""
+Load-test /v1/chat/send-message offline with a fake streaming model and fake tools.
+
+Run from the backend directory:
+    uv run python -m services.bench_chat --sessions 50 --turns 3 --tokens-per-sec 200
+
+The app is served by uvicorn on a loopback port with the chat model replaced by a
+scripted fake that streams at a fixed token rate, and the network-bound tools
+replaced by fakes with a fixed latency. Every session is an SSE client that sends
+its turns one after the other on its own thread. Latencies come from an untraced
+pass, the retained memory per session from a second pass under tracemalloc. Each
+run appends one JSON line (commit, parameters, results) to --output, so numbers
+can be compared across commits with --compare.
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import time
+import tracemalloc
+import uuid
+from dataclasses import asdict, dataclass, field
+
+import httpx
+import uvicorn
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import StructuredTool
+
+from app.agent.factory import get_default_llm
+from app.agent.react_agent.checkpointer import open_checkpointer
+from app.agent.react_agent.graph import tool_node
+from app.core.config import settings
+from app.main import app
+from services.benchmarks import append_record, matching_records, percentiles
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """
+    Chat model that streams `response_tokens` tokens at `tokens_per_sec`.
+
+    Within a turn it first requests the tools of `tool_script` one per model
+    call, then answers with text.
+    """
+
+    tokens_per_sec: float = 100
+    response_tokens: int = 60
+    tool_script: list[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next_tool(self, messages) -> str | None:
+        # tool results since the last human message tell how far the turn is
+        done = 0
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                break
+            done += isinstance(message, ToolMessage)
+        return self.tool_script[done] if done < len(self.tool_script) else None
+
+    def _usage(self, messages, output_tokens: int) -> dict:
+        input_tokens = sum(len(message.text) // 4 + 4 for message in messages)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        chunks = [
+            chunk.message
+            for chunk in self._chunks(messages)
+            if isinstance(chunk.message, AIMessageChunk)
+        ]
+        message = chunks[0]
+        for chunk in chunks[1:]:
+            message += chunk
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, messages) -> list[ChatGenerationChunk]:
+        tool = self._next_tool(messages)
+        if tool is not None:
+            args = json.dumps(_FAKE_TOOL_ARGS.get(tool, {}))
+            return [
+                ChatGenerationChunk(
+                    message=AIMessageChunk(
+                        content="",
+                        tool_call_chunks=[
+                            {
+                                "name": tool,
+                                "args": args,
+                                "id": f"call_{uuid.uuid4().hex[:12]}",
+                                "index": 0,
+                            }
+                        ],
+                        usage_metadata=self._usage(messages, 20),
+                    )
+                )
+            ]
+        chunks = [
+            ChatGenerationChunk(message=AIMessageChunk(content=f"tok{i} "))
+            for i in range(self.response_tokens)
+        ]
+        chunks.append(
+            ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="",
+                    usage_metadata=self._usage(messages, self.response_tokens),
+                )
+            )
+        )
+        return chunks
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        delay = 1 / self.tokens_per_sec if self.tokens_per_sec else 0
+        for chunk in self._chunks(messages):
+            await asyncio.sleep(delay)
+            if run_manager and chunk.message.content:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+_FAKE_TOOL_ARGS = {
+    "brave_search": {"query": "latest news"},
+    "get_weather_update": {"city": "Manila", "date": "2025-01-01T00:00:00"},
+}
+
+
+def install_fake_tools(latency_ms: float) -> None:
+    async def brave_search(query: str) -> str:
+        await asyncio.sleep(latency_ms / 1000)
+        return json.dumps([{"title": query, "link": "", "snippet": "x" * 400}] * 5)
+
+    # the graph is compiled at import, so the tool is replaced in its node
+    tool_node._tools_by_name["brave_search"] = StructuredTool.from_function(
+        coroutine=brave_search, name="brave_search", description="fake search"
+    )
+
+
+@dataclass
+class TurnResult:
+    ttfe: float | None = None
+    ttft: float | None = None
+    latency: float = 0.0
+    events: int = 0
+    bytes: int = 0
+    error: str | None = None
+
+
+@dataclass
+class BenchResult:
+    turns: int = 0
+    errors: int = 0
+    wall_seconds: float = 0.0
+    events_per_sec: float = 0.0
+    ttfe_ms: dict = field(default_factory=dict)
+    ttft_ms: dict = field(default_factory=dict)
+    turn_latency_ms: dict = field(default_factory=dict)
+    events_per_turn: float = 0.0
+    bytes_per_turn: float = 0.0
+    memory_per_session_kb: float = 0.0
+
+
+def run_input(thread_id: str, text: str) -> dict:
+    return {
+        "threadId": thread_id,
+        "runId": str(uuid.uuid4()),
+        "state": {},
+        "messages": [{"id": str(uuid.uuid4()), "role": "user", "content": text}],
+        "tools": [],
+        "context": [],
+        "forwardedProps": {},
+    }
+
+
+async def run_turn(client: httpx.AsyncClient, thread_id: str, text: str) -> TurnResult:
+    result = TurnResult()
+    start = time.perf_counter()
+    try:
+        async with client.stream(
+            "POST", "/v1/chat/send-message", json=run_input(thread_id, text)
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                result.events += 1
+                result.bytes += len(line) + 2
+                event_type = json.loads(line[5:])["type"]
+                now = time.perf_counter() - start
+                if result.ttfe is None and event_type != "RUN_STARTED":
+                    result.ttfe = now
+                if result.ttft is None and event_type == "TEXT_MESSAGE_CONTENT":
+                    result.ttft = now
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.latency = time.perf_counter() - start
+    return result
+
+
+async def run_session(
+    client: httpx.AsyncClient, turns: int, results: list[TurnResult]
+) -> None:
+    thread_id = str(uuid.uuid4())
+    for turn in range(turns):
+        results.append(await run_turn(client, thread_id, f"question {turn}"))
+
+
+async def run_sessions(
+    client: httpx.AsyncClient, args: argparse.Namespace, results: list[TurnResult]
+) -> None:
+    await asyncio.gather(
+        *(run_session(client, args.turns, results) for _ in range(args.sessions))
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def bench(args: argparse.Namespace) -> BenchResult:
+    llm = FakeStreamingChatModel(
+        tokens_per_sec=args.tokens_per_sec,
+        response_tokens=args.response_tokens,
+        tool_script=args.tool_script,
+    )
+    app.dependency_overrides[get_default_llm] = lambda: llm
+    install_fake_tools(args.tool_latency_ms)
+
+    port = free_port()
+    # the lifespan would connect to Milvus, only the checkpointer is needed here
+    server = uvicorn.Server(
+        uvicorn.Config(
+            app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"
+        )
+    )
+    results: list[TurnResult] = []
+    async with open_checkpointer():
+        server_task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        try:
+            limits = httpx.Limits(max_connections=args.sessions)
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120
+            ) as client:
+                # one warm-up turn so imports and first-call setup are not measured
+                await run_turn(client, str(uuid.uuid4()), "warm up")
+                start = time.perf_counter()
+                await run_sessions(client, args, results)
+                wall = time.perf_counter() - start
+                # tracing slows every allocation of the server in this process,
+                # so memory is measured on a second pass with fresh sessions
+                tracemalloc.start()
+                memory_before = tracemalloc.get_traced_memory()[0]
+                await run_sessions(client, args, [])
+                # what is still held after the sessions ended: checkpoints, caches
+                memory_after = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+        finally:
+            server.should_exit = True
+            await server_task
+
+    ok = [r for r in results if r.error is None]
+    total_events = sum(r.events for r in ok)
+    return BenchResult(
+        turns=len(results),
+        errors=len(results) - len(ok),
+        wall_seconds=round(wall, 3),
+        events_per_sec=round(total_events / wall, 1) if wall else 0.0,
+        ttfe_ms=percentiles([r.ttfe for r in ok if r.ttfe is not None]),
+        ttft_ms=percentiles([r.ttft for r in ok if r.ttft is not None]),
+        turn_latency_ms=percentiles([r.latency for r in ok]),
+        events_per_turn=round(total_events / len(ok), 1) if ok else 0.0,
+        bytes_per_turn=round(sum(r.bytes for r in ok) / len(ok), 1) if ok else 0.0,
+        memory_per_session_kb=round(
+            (memory_after - memory_before) / 1024 / args.sessions, 1
+        ),
+    )
+
+
+def parameters(args: argparse.Namespace) -> dict:
+    return {
+        "sessions": args.sessions,
+        "turns": args.turns,
+        "tokens_per_sec": args.tokens_per_sec,
+        "response_tokens": args.response_tokens,
+        "tool_script": args.tool_script,
+        "tool_latency_ms": args.tool_latency_ms,
+        "checkpointer": settings.checkpointer_backend,
+        "stream_text_flush_ms": settings.stream_text_flush_ms,
+    }
+
+
+def compare(output: str, params: dict) -> None:
+    print(f"{'commit':<10} {'ttft p50':>9} {'ttft p99':>9} {'turn p99':>9} {'ev/s':>8}")
+    for record in matching_records(output, params):
+        result = record["result"]
+        print(
+            f"{record['commit']:<10} {result['ttft_ms'].get('p50', 0):>9} "
+            f"{result['ttft_ms'].get('p99', 0):>9} "
+            f"{result['turn_latency_ms'].get('p99', 0):>9} "
+            f"{result['events_per_sec']:>8}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--tokens-per-sec", type=float, default=100)
+    parser.add_argument("--response-tokens", type=int, default=60)
+    parser.add_argument(
+        "--tool-script",
+        nargs="*",
+        default=["get_weather_update"],
+        help="Tools requested one after the other in every turn",
+    )
+    parser.add_argument("--tool-latency-ms", type=float, default=50)
+    parser.add_argument(
+        "--checkpointer", choices=["memory", "sqlite"], default="memory"
+    )
+    parser.add_argument("--output", default="../data/benchmarks/chat_load.jsonl")
+    parser.add_argument(
+        "--compare", action="store_true", help="Show earlier runs with these parameters"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    settings.checkpointer_backend = args.checkpointer
+    if args.checkpointer == "sqlite":
+        settings.checkpointer_sqlite_path = f".cache/bench-{uuid.uuid4().hex}.sqlite"
+
+    result = asyncio.run(bench(args))
+    record = append_record(args.output, parameters(args), asdict(result))
+    print(json.dumps(record, indent=2))
+    if args.compare:
+        compare(args.output, record["parameters"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+"""
+Measure retrieval quality and latency offline on Milvus Lite.
+
+Run from the backend directory:
+    uv run python -m services.bench_retrieval --sample-size 5000 --chunker markdown_recursive
+
+The first `--sample-size` RecipeNLG rows are rendered like the ingestion loader
+does, chunked with the selected strategy, embedded with a deterministic hashing
+embedder and indexed into a fresh Milvus Lite collection built from the app's
+schema and index definition. The labelled queries (recipe title or a few of its
+ingredients, labelled with the recipe they come from) are generated once with a
+fixed seed and kept in --queries-file, so every run answers the same questions.
+The file records the sample it was built for and is regenerated when the
+sample, seed or query count changes.
+
+Each run appends recall@k, MRR, build time, memory and search latency
+percentiles to --output, together with the commit and the parameters.
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import random
+import re
+import resource
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import kagglehub
+import numpy as np
+import pandas as pd
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from pymilvus import MilvusClient
+
+from app.core.config import settings
+from app.services.rag.indexing.chunking import (
+    available_strategies,
+    create_strategy,
+    get_chunking_strategy,
+)
+from app.services.rag.indexing.loader import (
+    RECIPENLG_COLUMNS,
+    RECIPENLG_FILE,
+    RECIPENLG_HANDLE,
+    recipe_to_document,
+)
+from app.services.rag.indexing.store import chunk_id
+from client.milvus_client import (
+    VECTOR_INDEX_NAME,
+    build_index_params,
+    build_schema,
+    build_search_params,
+    index_definition,
+)
+from services.benchmarks import append_record, matching_records, percentiles
+
+# the text field of the collection schema
+MAX_TEXT_LENGTH = 2000
+# index types Milvus Lite can build, others fail in its background index build
+# and leave the collection searched without an index
+LITE_INDEX_TYPES = ["HNSW", "IVF_FLAT", "IVF_SQ8"]
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words embeddings: word unigrams and bigrams hashed into
+    `dim` signed buckets, L2 normalized. Needs no model or network, so numbers
+    only move when chunking or index settings change.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def _features(self, text: str) -> list[str]:
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+def chunker_for(name: str, chunk_size: int | None, chunk_overlap: int | None):
+    """
+    A registered chunking strategy, `markdown_recursive` is what /rag/ingest
+    runs and `markdown` what the bulk loader runs. `none` indexes whole recipes.
+    """
+    if name == "none":
+        return lambda docs: docs
+    params = {}
+    if chunk_size is not None:
+        params["chunk_size"] = chunk_size
+    if chunk_overlap is not None:
+        params["chunk_overlap"] = chunk_overlap
+    strategy = (
+        create_strategy(name, **params) if params else get_chunking_strategy(name)
+    )
+    return strategy.split_documents
+
+
+def load_sample(csv_path: str, sample_size: int) -> list[Document]:
+    frame = pd.read_csv(
+        csv_path, usecols=RECIPENLG_COLUMNS, nrows=sample_size, dtype=str
+    ).fillna("")
+    docs = []
+    for recipe_id, row in enumerate(
+        frame[RECIPENLG_COLUMNS].itertuples(index=False, name=None)
+    ):
+        try:
+            doc = recipe_to_document(*row)
+        except (ValueError, SyntaxError):
+            continue
+        # the loader escapes newlines, the header splitters need them back
+        doc.page_content = doc.page_content.replace("\\n", "\n")
+        doc.metadata["recipe_id"] = recipe_id
+        docs.append(doc)
+    return docs
+
+
+def build_queries(docs: list[Document], count: int, seed: int) -> list[dict]:
+    """
+    Half of the queries are recipe titles, the other half up to three of the
+    recipe's ingredients. Each is labelled with the recipe it was taken from.
+    """
+    rng = random.Random(seed)
+    picked = rng.sample(docs, min(count, len(docs)))
+    queries = []
+    for i, doc in enumerate(picked):
+        ingredients = ast.literal_eval(doc.metadata["raw_ner"] or "[]")
+        if i % 2 == 0 or not ingredients:
+            query, kind = doc.metadata["food_name"], "title"
+        else:
+            items = rng.sample(ingredients, min(3, len(ingredients)))
+            query, kind = "recipe with " + ", ".join(items), "ingredients"
+        queries.append(
+            {"query": query, "kind": kind, "recipe_id": doc.metadata["recipe_id"]}
+        )
+    return queries
+
+
+def corpus_fingerprint(docs: list[Document]) -> str:
+    """
+    Hash of the sampled recipes, labels are only valid for the same sample.
+    """
+    digest = hashlib.sha256()
+    for doc in docs:
+        digest.update(f"{doc.metadata['recipe_id']}\0{doc.page_content}\0".encode())
+    return digest.hexdigest()
+
+
+def load_queries(
+    path: str, docs: list[Document], sample_size: int, count: int, seed: int
+) -> list[dict]:
+    """
+    Queries kept in `path`, regenerated when they were built for another
+    sample, seed or count.
+    """
+    queries_file = Path(path)
+    expected = {
+        "sample_size": sample_size,
+        "count": count,
+        "seed": seed,
+        "corpus": corpus_fingerprint(docs),
+    }
+    if queries_file.exists():
+        stored = json.loads(queries_file.read_text())
+        header = (
+            {key: stored.get(key) for key in expected}
+            if isinstance(stored, dict)
+            else {}
+        )
+        recipe_ids = {doc.metadata["recipe_id"] for doc in docs}
+        if header == expected and all(
+            query["recipe_id"] in recipe_ids for query in stored["queries"]
+        ):
+            return stored["queries"]
+        print(
+            f"[WARN] {queries_file} was built for another sample or seed, "
+            "regenerating it"
+        )
+    queries = build_queries(docs, count, seed)
+    queries_file.parent.mkdir(parents=True, exist_ok=True)
+    queries_file.write_text(json.dumps({**expected, "queries": queries}, indent=2))
+    print(f"[INFO] Wrote {len(queries)} labelled queries to {queries_file}")
+    return queries
+
+
+def rss_mb() -> float:
+    """
+    Resident memory of this process. Milvus Lite runs in-process, so its index
+    is included.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def configure(args: argparse.Namespace, db_path: Path) -> None:
+    """
+    Point the settings used by the schema, index and search helpers at the
+    benchmark parameters and a throwaway Milvus Lite file.
+    """
+    settings.milvus_uri = str(db_path)
+    settings.encoder_dim = args.dim
+    settings.vector_index_type = args.index_type
+    settings.vector_metric_type = args.metric
+    settings.hnsw_m = args.hnsw_m
+    settings.hnsw_ef_construction = args.hnsw_ef_construction
+    settings.ivf_nlist = args.ivf_nlist
+    settings.ivf_pq_m = args.ivf_pq_m
+
+
+def check_index(client: MilvusClient, collection: str) -> dict:
+    """
+    The index Milvus actually built, so a run never reports numbers for an index
+    it was not using. Raises when it differs from the requested one.
+    """
+    expected = index_definition()
+    info = client.describe_index(
+        collection_name=collection, index_name=VECTOR_INDEX_NAME
+    )
+    mismatches = [
+        f"{key}={info.get(key)!r} (expected {value!r})"
+        for key, value in {
+            "index_type": expected["index_type"],
+            "metric_type": expected["metric_type"],
+            "state": "Finished",
+        }.items()
+        if info.get(key) != value
+    ]
+    # servers report the build parameters next to the type, Milvus Lite does not
+    mismatches += [
+        f"{key}={info[key]!r} (expected {value!r})"
+        for key, value in expected["params"].items()
+        if key in info and str(info[key]) != str(value)
+    ]
+    if mismatches:
+        raise RuntimeError(f"Vector index was not built as requested: {mismatches}")
+    return {
+        "index_type": info["index_type"],
+        "metric_type": info["metric_type"],
+        "params": expected["params"],
+    }
+
+
+def bench(args: argparse.Namespace) -> dict:
+    csv_path = args.csv or str(
+        Path(kagglehub.dataset_download(RECIPENLG_HANDLE)) / RECIPENLG_FILE
+    )
+    docs = load_sample(csv_path, args.sample_size)
+    queries = load_queries(
+        args.queries_file, docs, args.sample_size, args.queries, args.seed
+    )
+    embedder = HashingEmbeddings(args.dim)
+    chunker = chunker_for(args.chunker, args.chunk_size, args.chunk_overlap)
+
+    started = time.perf_counter()
+    chunks = chunker(docs)
+    chunk_seconds = time.perf_counter() - started
+    oversized = sum(len(chunk.page_content) > MAX_TEXT_LENGTH for chunk in chunks)
+
+    started = time.perf_counter()
+    vectors = embedder.embed_documents([chunk.page_content for chunk in chunks])
+    embed_seconds = time.perf_counter() - started
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench-retrieval-"))
+    configure(args, workdir / "milvus.db")
+    try:
+        memory_before = rss_mb()
+        client = MilvusClient(settings.milvus_uri)
+        collection = "bench_retrieval"
+        started = time.perf_counter()
+        client.create_collection(
+            collection_name=collection,
+            schema=build_schema(client),
+            index_params=build_index_params(client),
+        )
+        rows = [
+            {
+                "id": chunk_id(str(chunk.metadata["recipe_id"]), chunk.page_content),
+                "doc_id": str(chunk.metadata["recipe_id"]),
+                # chunks over the schema limit would be rejected, see `oversized`
+                "text": chunk.page_content[:MAX_TEXT_LENGTH],
+                "vector": vector,
+                "recipe_id": chunk.metadata["recipe_id"],
+            }
+            for chunk, vector in zip(chunks, vectors, strict=True)
+        ]
+        for i in range(0, len(rows), args.insert_batch_size):
+            client.insert(
+                collection_name=collection,
+                data=rows[i : i + args.insert_batch_size],
+            )
+        client.flush(collection_name=collection)
+        client.load_collection(collection_name=collection)
+        build_seconds = time.perf_counter() - started
+        index = check_index(client, collection)
+        memory_after = rss_mb()
+
+        top_k = max(args.k)
+        search_params = build_search_params(top_k=top_k, ef=args.ef, nprobe=args.nprobe)
+        query_vectors = [embedder.embed_query(q["query"]) for q in queries]
+
+        def search(vector: list[float]) -> list[dict]:
+            return client.search(
+                collection_name=collection,
+                data=[vector],
+                limit=top_k,
+                output_fields=["recipe_id"],
+                search_params=search_params,
+            )[0]
+
+        # warm up so the first search does not pay for lazy loading
+        for vector in query_vectors[:10]:
+            search(vector)
+        latencies = []
+        ranks: list[int | None] = []
+        for query, vector in zip(queries, query_vectors):
+            started = time.perf_counter()
+            hits = search(vector)
+            latencies.append(time.perf_counter() - started)
+            found = [hit["entity"]["recipe_id"] for hit in hits]
+            ranks.append(
+                found.index(query["recipe_id"]) + 1
+                if query["recipe_id"] in found
+                else None
+            )
+        client.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    def quality(kind: str | None) -> dict:
+        selected = [
+            rank
+            for query, rank in zip(queries, ranks)
+            if kind is None or query["kind"] == kind
+        ]
+        if not selected:
+            return {}
+        result = {
+            f"recall@{k}": round(
+                sum(rank is not None and rank <= k for rank in selected)
+                / len(selected),
+                4,
+            )
+            for k in sorted(args.k)
+        }
+        result["mrr"] = round(
+            sum(1 / rank for rank in selected if rank is not None) / len(selected), 4
+        )
+        return result
+
+    return {
+        "documents": len(docs),
+        "chunks": len(chunks),
+        "oversized_chunks": oversized,
+        "avg_chunk_chars": round(
+            sum(len(chunk.page_content) for chunk in chunks) / len(chunks), 1
+        ),
+        "queries": len(queries),
+        "index": index,
+        "quality": quality(None),
+        "quality_by_kind": {
+            kind: quality(kind) for kind in sorted({q["kind"] for q in queries})
+        },
+        "chunk_seconds": round(chunk_seconds, 3),
+        "embed_seconds": round(embed_seconds, 3),
+        "build_seconds": round(build_seconds, 3),
+        "index_memory_mb": round(memory_after - memory_before, 1),
+        "search_latency_ms": percentiles(latencies),
+    }
+
+
+def parameters(args: argparse.Namespace) -> dict:
+    return {
+        "sample_size": args.sample_size,
+        "queries_file": args.queries_file,
+        "chunker": args.chunker,
+        "chunk_size": args.chunk_size,
+        "chunk_overlap": args.chunk_overlap,
+        "dim": args.dim,
+        "index_type": args.index_type,
+        "metric": args.metric,
+        "hnsw_m": args.hnsw_m,
+        "hnsw_ef_construction": args.hnsw_ef_construction,
+        "ivf_nlist": args.ivf_nlist,
+        "ivf_pq_m": args.ivf_pq_m,
+        "ef": args.ef,
+        "nprobe": args.nprobe,
+        "k": sorted(args.k),
+    }
+
+
+def compare(output: str, params: dict) -> None:
+    k = max(params["k"])
+    print(f"{'commit':<10} {f'recall@{k}':>10} {'mrr':>7} {'build s':>8} {'p99 ms':>8}")
+    for record in matching_records(output, params):
+        result = record["result"]
+        print(
+            f"{record['commit']:<10} {result['quality'].get(f'recall@{k}', 0):>10} "
+            f"{result['quality'].get('mrr', 0):>7} {result['build_seconds']:>8} "
+            f"{result['search_latency_ms'].get('p99', 0):>8}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--csv", help="Path to RecipeNLG_dataset.csv. Downloaded when omitted."
+    )
+    parser.add_argument("--sample-size", type=int, default=5000)
+    parser.add_argument(
+        "--queries-file", default="../data/benchmarks/retrieval_queries.json"
+    )
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--chunker",
+        choices=["none", *available_strategies()],
+        default="markdown_recursive",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=None, help="Defaults to the strategy's"
+    )
+    parser.add_argument("--chunk-overlap", type=int, default=None)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument(
+        "--index-type",
+        choices=LITE_INDEX_TYPES,
+        default=settings.vector_index_type
+        if settings.vector_index_type in LITE_INDEX_TYPES
+        else "HNSW",
+    )
+    parser.add_argument("--metric", default=settings.vector_metric_type)
+    parser.add_argument("--hnsw-m", type=int, default=settings.hnsw_m)
+    parser.add_argument(
+        "--hnsw-ef-construction", type=int, default=settings.hnsw_ef_construction
+    )
+    parser.add_argument("--ivf-nlist", type=int, default=settings.ivf_nlist)
+    parser.add_argument("--ivf-pq-m", type=int, default=settings.ivf_pq_m)
+    parser.add_argument("--ef", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, default=None)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--insert-batch-size", type=int, default=1000)
+    parser.add_argument("--output", default="../data/benchmarks/retrieval.jsonl")
+    parser.add_argument(
+        "--compare", action="store_true", help="Show earlier runs with these parameters"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    result = bench(args)
+    record = append_record(args.output, parameters(args), result)
+    print(json.dumps(record, indent=2))
+    if args.compare:
+        compare(args.output, record["parameters"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Shared helpers of the benchmark scripts: percentiles and the JSONL result log.
+"""
+
+import json
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+
+def percentiles(values: list[float]) -> dict:
+    """
+    p50/p90/p99/max of durations given in seconds, in milliseconds.
+    """
+    if not values:
+        return {}
+    ms = np.asarray(values) * 1000
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 2),
+        "p90": round(float(np.percentile(ms, 90)), 2),
+        "p99": round(float(np.percentile(ms, 99)), 2),
+        "max": round(float(ms.max()), 2),
+    }
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def append_record(output: str, parameters: dict, result: dict) -> dict:
+    """
+    Append one run to the JSONL log at `output` and return the record.
+    """
+    record = {
+        "commit": current_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "parameters": parameters,
+        "result": result,
+    }
+    path = Path(output)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as f:
+        f.write(json.dumps(record) + "\n")
+    return record
+
+
+def matching_records(output: str, parameters: dict) -> list[dict]:
+    """
+    Recorded runs that used the same parameters, oldest first.
+    """
+    path = Path(output)
+    if not path.exists():
+        return []
+    records = [json.loads(line) for line in path.read_text().splitlines() if line]
+    return [record for record in records if record["parameters"] == parameters]
@@ -0,0 +1,127 @@
+"""
+Stream the full RecipeNLG dataset into Parquet files for Milvus bulk import.
+
+Run from the backend directory:
+    uv run python -m services.stream_dataset --output-dir ../data/recipenlg_parquet
+
+The CSV is read in slices, rendered in a process pool and embedded in batches, so
+memory use stays flat no matter how many rows are processed. Once the files are
+copied into the Milvus object storage bucket, pass `--bulk-import` together with
+`--remote-prefix` to create the import job.
+
+To refresh a collection that already holds the dataset, pass `--sync` instead:
+recipes are diffed against the stored chunk ids, only new or edited ones are
+embedded and upserted straight into Milvus, and stale chunks are deleted.
+"""
+
+import argparse
+import asyncio
+from pathlib import PurePosixPath
+
+import httpx
+import kagglehub
+
+from app.core.config import settings
+from app.services.rag.indexing.bi_encoders import get_bi_encoder_model
+from app.services.rag.indexing.loader import (
+    RECIPENLG_FILE,
+    RECIPENLG_HANDLE,
+    stream_recipe_chunks,
+)
+from app.services.rag.indexing.pipeline import ingest_documents, sync_documents
+from app.services.rag.indexing.store import ParquetSink
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--csv", help="Path to RecipeNLG_dataset.csv. Downloaded when omitted."
+    )
+    parser.add_argument("--output-dir", default="../data/recipenlg_parquet")
+    parser.add_argument("--limit", type=int, default=None, help="Max rows to load")
+    parser.add_argument("--csv-chunksize", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rows-per-file", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Update the Milvus collection in place instead of writing Parquet files",
+    )
+    parser.add_argument(
+        "--bulk-import",
+        action="store_true",
+        help="Create a Milvus import job for the written files",
+    )
+    parser.add_argument(
+        "--remote-prefix",
+        default="",
+        help="Object storage prefix the files were uploaded under",
+    )
+    return parser.parse_args()
+
+
+def submit_bulk_import(files: list[str], remote_prefix: str) -> dict:
+    """
+    Create a Milvus import job through the RESTful API. Each Parquet file is
+    imported as its own file group.
+    """
+    remote_files = [
+        [str(PurePosixPath(remote_prefix) / PurePosixPath(f).name)] for f in files
+    ]
+    res = httpx.post(
+        f"{settings.milvus_uri}/v2/vectordb/jobs/import/create",
+        json={
+            "dbName": settings.milvus_db_name,
+            "collectionName": settings.collection_name,
+            "files": remote_files,
+        },
+    )
+    res.raise_for_status()
+    return res.json()
+
+
+async def main(args: argparse.Namespace) -> None:
+    csv_path = args.csv or kagglehub.dataset_download(
+        handle=RECIPENLG_HANDLE, path=RECIPENLG_FILE
+    )
+    chunks = stream_recipe_chunks(
+        csv_path,
+        csv_chunksize=args.csv_chunksize,
+        workers=args.workers,
+        limit=args.limit,
+    )
+    if args.sync:
+        # imported lazily, the Parquet export does not need a Milvus connection
+        from client.milvus_client import get_milvus_client
+
+        await sync_documents(
+            chunks=chunks,
+            encoder=get_bi_encoder_model(),
+            vector_db=get_milvus_client(),
+            batch_size=args.batch_size,
+            max_concurrency=args.max_concurrency,
+        )
+        return
+
+    sink = ParquetSink(args.output_dir, rows_per_file=args.rows_per_file)
+    try:
+        await ingest_documents(
+            docs=chunks,
+            encoder=get_bi_encoder_model(),
+            batch_size=args.batch_size,
+            max_concurrency=args.max_concurrency,
+            sink=sink,
+        )
+    finally:
+        files = sink.close()
+    print(f"[INFO] Wrote {len(files)} Parquet files to {args.output_dir}")
+
+    if args.bulk_import:
+        res = submit_bulk_import(files, args.remote_prefix)
+        print(f"[INFO] Bulk import job submitted: {res}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))